@@ -1,23 +1,22 @@
 from __future__ import annotations
 
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 from components.authentication import require_auth, logout_button, get_user
-from components.data_loader import load_data_with_ui, clear_data_cache
+from components.data_loader import load_data_with_ui, clear_data_cache, canonical_columns
 from components.filters import sidebar_filters, apply_dataframe_filters
-from components.charts import (
-    chart_projects_by_status,
-    chart_projects_by_keywords,
-    chart_created_vs_due_date,
-    chart_by_resource,
-    chart_status_over_time,
-    chart_priority_breakdown,
-    chart_progress_funnel,
-)
-from components.ai_chat import chat_ui
 from components import utils
-from components.report import generate_report_html
+
+
+# Rows rendered in the data table before the user opts into the full frame
+TABLE_PREVIEW_ROWS = 2000
+# Charts draw a fixed random sample of larger frames unless the user opts out
+CHART_SAMPLE_ROWS = 50_000
 
 
 def page_setup() -> None:
@@ -30,35 +29,41 @@ def page_setup() -> None:
     utils.inject_css()
 
 
+def _store_dashboard_df(df: pd.DataFrame, last_updated: str) -> None:
+    st.session_state.dashboard_df = df
+    st.session_state.dashboard_last_updated = last_updated
+
+
 def kpi_area(df: pd.DataFrame) -> None:
+    if df.empty:
+        # Over-filtered: nothing to classify, skip the column lookup and counts
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Total Tickets", 0)
+        c2.metric("Active Tickets", 0, delta="0.0% of total")
+        c3.metric("Completed Tickets", 0)
+        c4.metric("Pending / In-Progress Tickets", 0)
+        return
     total = len(df)
-    # Heuristic columns - check multiple case variations
-    status_col = None
-    for col in df.columns:
-        if col.lower() == "status":
-            status_col = col
-            break
+    # Canonical columns are resolved once at load time and carried in df.attrs
+    status_col = (df.attrs.get("canonical") or canonical_columns(df)).get("status")
     
     active_count = 0
     completed_count = 0
     in_progress_count = 0
     pending_count = 0
     if status_col:
-        vals = df[status_col].astype(str).str.strip()
-        vals_lower = vals.str.lower()
+        # Count each distinct label once (a code histogram for the categorical status
+        # column), then bucket the few labels rather than every row
+        label_counts = df[status_col].value_counts()
+        # Trim + lowercase the labels with Arrow kernels in one pass over the buffer
+        labels = pc.utf8_lower(pc.utf8_trim_whitespace(pa.array(label_counts.index.astype("string").array)))
+        counts = label_counts.groupby(labels.to_pandas().map(utils.STATUS_BUCKET).to_numpy()).sum()
         
         # Active Tickets: "To do", "In Progress", and "Reopened"
-        # Check case-insensitive patterns with various formats
-        todo_statuses = ["to do", "todo", "to-do"]
-        in_progress_statuses = ["in progress", "in-progress", "inprogress"]
-        reopened_statuses = ["reopened", "re-open", "reopen", "re opened"]
-        active_statuses = todo_statuses + in_progress_statuses + reopened_statuses
-        active_count = int(vals_lower.isin(active_statuses).sum())
-        
-        # Keep separate counts for other metrics
-        in_progress_count = int(vals_lower.isin(in_progress_statuses).sum())
-        completed_count = int(vals_lower.isin(["done", "completed", "closed", "finished"]).sum())
-        pending_count = int(vals_lower.isin(["pending", "backlog", "paused", "blocked"]).sum())
+        in_progress_count = int(counts.get("inprog", 0))
+        active_count = int(counts.get("todo", 0)) + in_progress_count + int(counts.get("reopened", 0))
+        completed_count = int(counts.get("done", 0))
+        pending_count = int(counts.get("pending", 0))
     
     pending_in_progress = pending_count + in_progress_count
 
@@ -100,34 +105,16 @@ def main() -> None:
     # Logo in sidebar above logout - big and looping GIF
     logo_path = "Untitled design.gif"
     try:
-        import os
-        from pathlib import Path
-        logo_file = Path(logo_path)
-        if logo_file.exists():
-            # Use HTML img tag for better GIF support
-            logo_bytes = logo_file.read_bytes()
-            import base64
-            logo_b64 = base64.b64encode(logo_bytes).decode()
-            st.sidebar.markdown(
-                f"""
-                <div style='text-align: center; margin: 20px 0; padding: 10px;'>
-                    <img src="data:image/gif;base64,{logo_b64}" 
-                         style="width: 250px; height: auto; border-radius: 15px; box-shadow: 0 8px 32px rgba(102, 126, 234, 0.3);" 
-                         alt="Logo">
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+        if Path(logo_path).exists():
+            # Served from Streamlit's media endpoint so the browser caches it across
+            # reruns; radius/shadow come from the sidebar img rule in inject_css
+            st.sidebar.image(logo_path, width=250)
         else:
             st.sidebar.markdown("### 📊")
             st.sidebar.caption("Logo file not found")
     except Exception as e:
-        # Fallback to Streamlit image
-        try:
-            st.sidebar.image(logo_path, width=250, use_column_width=False)
-        except:
-            st.sidebar.markdown("### 📊")
-            st.sidebar.caption(f"Logo error: {str(e)[:50]}")
+        st.sidebar.markdown("### 📊")
+        st.sidebar.caption(f"Logo error: {str(e)[:50]}")
     
     logout_button()
 
@@ -161,10 +148,10 @@ def main() -> None:
     from components.data_loader import _demo_df, OPENPYXL_AVAILABLE
     
     # Use session state to cache loaded data and avoid re-fetching on every rerun
-    if 'dashboard_df' not in st.session_state or 'dashboard_last_updated' not in st.session_state:
+    # (_store_dashboard_df always writes the frame and its timestamp together)
+    if "dashboard_df" not in st.session_state:
         # Initialize with demo data immediately
-        st.session_state.dashboard_df = _demo_df()
-        st.session_state.dashboard_last_updated = "Demo (loading...)"
+        _store_dashboard_df(_demo_df(), "Demo (loading...)")
 
     # Try to load real data, but don't block on it
     PUBLISHED_XLSX_URL = (
@@ -187,15 +174,13 @@ def main() -> None:
                 published_url_override=xlsx_url,
             )
             if df is not None and not df.empty:
-                st.session_state.dashboard_df = df
-                st.session_state.dashboard_last_updated = last_updated
+                _store_dashboard_df(df, last_updated)
                 status_container.success("✅ Data loaded!")
             else:
                 status_container.warning("⚠️ No data loaded, using demo data")
         except Exception as e:
             status_container.error(f"❌ Error: {str(e)[:50]}")
-            st.session_state.dashboard_df = _demo_df()
-            st.session_state.dashboard_last_updated = "Demo"
+            _store_dashboard_df(_demo_df(), "Demo")
     else:
         st.sidebar.info("ℹ️ Using demo data. Check 'Load live data' to fetch from external sources.")
     
@@ -207,8 +192,7 @@ def main() -> None:
     if df is None or df.empty:
         df = _demo_df()
         last_updated = "Demo"
-        st.session_state.dashboard_df = df
-        st.session_state.dashboard_last_updated = last_updated
+        _store_dashboard_df(df, last_updated)
 
     meta.caption(f"Last updated: {last_updated}")
 
@@ -221,54 +205,77 @@ def main() -> None:
 
     # Charts (tabs)
     st.subheader("Visualizations")
+    chart_df = filtered
+    if len(filtered) > CHART_SAMPLE_ROWS and st.sidebar.checkbox(
+        f"Sample {CHART_SAMPLE_ROWS:,} rows for charts", value=True, help="Very large frames can stall the browser when plotted"
+    ):
+        chart_df = filtered.sample(CHART_SAMPLE_ROWS, random_state=0)
+        st.caption(f"Charts show a random sample of {CHART_SAMPLE_ROWS:,} of {len(filtered):,} tickets.")
     t1, t2, t3, t4, t5, t6, t7 = st.tabs([
         "By Status", "By Keywords", "Created vs Due", "By Resource", 
         "Status Over Time", "Priority", "Progress Funnel"
     ])
+    # Chart/report/chat modules pull in plotly, kaleido and requests; import them
+    # where they are first used so the title, sidebar and KPIs paint first
     with t1:
-        chart_projects_by_status(filtered)
+        from components.charts import chart_projects_by_status
+        chart_projects_by_status(chart_df)
     with t2:
-        chart_projects_by_keywords(filtered)
+        from components.charts import chart_projects_by_keywords
+        chart_projects_by_keywords(chart_df)
     with t3:
-        chart_created_vs_due_date(filtered)
+        from components.charts import chart_created_vs_due_date
+        chart_created_vs_due_date(chart_df)
     with t4:
-        chart_by_resource(filtered)
+        from components.charts import chart_by_resource
+        chart_by_resource(chart_df)
     with t5:
-        chart_status_over_time(filtered)
+        from components.charts import chart_status_over_time
+        chart_status_over_time(chart_df)
     with t6:
-        chart_priority_breakdown(filtered)
+        from components.charts import chart_priority_breakdown
+        chart_priority_breakdown(chart_df)
     with t7:
-        chart_progress_funnel(filtered)
+        from components.charts import chart_progress_funnel
+        chart_progress_funnel(chart_df)
 
     # Data table and exports
     st.subheader("Data Table")
     st.caption(f"Rows: {len(filtered)}")
-    st.dataframe(filtered, use_container_width=True)
+    # Every rerun ships the rendered frame to the browser as Arrow; cap it for large tables
+    if len(filtered) > TABLE_PREVIEW_ROWS and not st.checkbox(
+        f"Show all {len(filtered)} rows", value=False, help=f"Only the first {TABLE_PREVIEW_ROWS} rows are shown by default"
+    ):
+        st.dataframe(filtered.head(TABLE_PREVIEW_ROWS), use_container_width=True)
+    else:
+        st.dataframe(filtered, use_container_width=True)
 
+    # Exports are generated by callables, i.e. only when the user clicks a button
+    ts = utils.now_ts().replace(" ", "_").replace(":", "-")
     exp_c1, exp_c2, exp_c3 = st.columns([1, 1, 1])
     with exp_c1:
         st.download_button(
             "Download CSV",
-            data=utils.to_csv_bytes(filtered),
-            file_name=f"rnd-dashboard-{utils.now_ts().replace(' ', '_').replace(':','-')}.csv",
+            data=lambda: utils.to_csv_bytes(filtered),
+            file_name=f"rnd-dashboard-{ts}.csv",
             mime="text/csv",
         )
     with exp_c2:
         if utils.openpyxl_available():
             st.download_button(
                 "Download Excel",
-                data=utils.to_excel_bytes(filtered),
-                file_name=f"rnd-dashboard-{utils.now_ts().replace(' ', '_').replace(':','-')}.xlsx",
+                data=lambda: utils.to_excel_bytes(filtered),
+                file_name=f"rnd-dashboard-{ts}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
         else:
             st.error("⚠️ Excel export unavailable. openpyxl is not installed. Please ensure 'openpyxl' is in requirements.txt.")
     with exp_c3:
-        html_bytes = generate_report_html(filtered)
+        from components.report import generate_report_html_cached
         st.download_button(
             "Download Dashboard Report (HTML)",
-            data=html_bytes,
-            file_name=f"rnd-dashboard-report-{utils.now_ts().replace(' ', '_').replace(':','-')}.html",
+            data=lambda: generate_report_html_cached(filtered),
+            file_name=f"rnd-dashboard-report-{ts}.html",
             mime="text/html",
         )
 
@@ -280,6 +287,7 @@ def main() -> None:
     
     # Optional AI chat (requires OpenRouter API key)
     with st.expander("🤖 AI Chatbot  )", expanded=False):
+        from components.ai_chat import chat_ui
         chat_ui(filtered)
 
 
@@ -1,13 +1,12 @@
 from __future__ import annotations
 
-import time
-from typing import List, Dict
+from typing import Dict
 
 import pandas as pd
 import requests
 import streamlit as st
 
-from .utils import dataframe_to_compact_json
+from .utils import dataframe_to_compact_json, http_session, iter_sse_content, openrouter_api_key
 
 
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
@@ -18,13 +17,12 @@ MODEL_OPTIONS = [
     "meta-llama/llama-3.2-3b-instruct:free",  # Free fallback
 ]
 
+# Pooled keep-alive connection; 429/5xx are retried with backoff by the adapter
+_SESSION = http_session(retries=2, backoff_factor=0.5)
+
 
 def _headers() -> Dict[str, str]:
-    api_key = None
-    try:
-        api_key = st.secrets["openrouter"]["api_key"]  # type: ignore[index]
-    except Exception:
-        api_key = None
+    api_key = openrouter_api_key()
     if not api_key:
         raise RuntimeError("Missing OpenRouter API key in secrets. Add [openrouter].api_key to .streamlit/secrets.toml")
     return {
@@ -35,72 +33,62 @@ def _headers() -> Dict[str, str]:
     }
 
 
-def ask_ai(filtered_df: pd.DataFrame, user_query: str) -> str:
+def _open_stream(filtered_df: pd.DataFrame, user_query: str) -> requests.Response:
+    """Start a streaming completion, falling back through MODEL_OPTIONS until one accepts."""
     system_context = (
         "You are an AI assistant analyzing R&D ticket data. Respond concisely and accurately. "
         "Here is the current filtered ticket data as JSON array: " + dataframe_to_compact_json(filtered_df)
     )
     
-    # Try each model until one works
+    # Try the last model that answered first, then the rest in preference order
+    last_good = st.session_state.get("last_good_model")
+    model_order = [m for m in [last_good] + [m for m in MODEL_OPTIONS if m != last_good] if m]
+    
+    # Try each model until one works (429/5xx backoff is handled by _SESSION)
     last_error = None
-    for model in MODEL_OPTIONS:
+    for model in model_order:
         payload = {
             "model": model,
             "messages": [
                 {"role": "system", "content": system_context},
                 {"role": "user", "content": user_query},
             ],
+            "stream": True,
         }
         
-        for attempt in range(2):  # 2 attempts per model
-            try:
-                resp = requests.post(OPENROUTER_URL, headers=_headers(), json=payload, timeout=30)
-                if resp.status_code == 429:
-                    time.sleep(1 + attempt)
-                    continue
-                if resp.status_code in (404, 400):
-                    # Model doesn't exist or invalid, try next one
-                    error_detail = resp.text[:300] if hasattr(resp, 'text') else ""
-                    last_error = f"Model '{model}' not available ({resp.status_code})"
-                    break  # Try next model
-                resp.raise_for_status()
-                data = resp.json()
-                if "choices" in data and len(data["choices"]) > 0:
-                    return data["choices"][0]["message"]["content"].strip()
-                raise ValueError("Unexpected API response format")
-            except requests.exceptions.HTTPError as e:
-                if resp.status_code in (404, 400):
-                    # Already handled above, break to try next model
-                    break
-                if attempt == 1:
-                    error_detail = resp.text[:300] if hasattr(resp, 'text') else str(e)
-                    last_error = f"API error ({resp.status_code}): {error_detail}"
-            except Exception as e:
-                if attempt == 1:
-                    last_error = str(e)
-                time.sleep(0.5)
+        try:
+            resp = _SESSION.post(OPENROUTER_URL, headers=_headers(), json=payload, stream=True, timeout=60)
+            if resp.status_code in (404, 400):
+                # Model doesn't exist or invalid, try next one
+                last_error = f"Model '{model}' not available ({resp.status_code})"
+                resp.close()
+                continue
+            resp.raise_for_status()
+            st.session_state["last_good_model"] = model
+            return resp
+        except requests.exceptions.HTTPError as e:
+            error_detail = resp.text[:300] if hasattr(resp, 'text') else str(e)
+            last_error = f"API error ({resp.status_code}): {error_detail}"
+        except Exception as e:
+            last_error = str(e)
     
     # If all models failed
     raise RuntimeError(f"All models failed. Last error: {last_error}")
 
 
+def ask_ai(filtered_df: pd.DataFrame, user_query: str) -> str:
+    return "".join(iter_sse_content(_open_stream(filtered_df, user_query))).strip()
+
+
 def chat_ui(filtered_df: pd.DataFrame) -> None:
     st.subheader("AI Assistant")
     
     # Check if API key is configured
-    api_key_configured = False
-    try:
-        api_key = st.secrets["openrouter"]["api_key"]  # type: ignore[index]
-        api_key_configured = bool(api_key)
-    except Exception:
-        pass
-    
-    if not api_key_configured:
+    if not openrouter_api_key():
         st.info("💡 AI chat requires an OpenRouter API key. Add `[openrouter].api_key` to `.streamlit/secrets.toml`. Get a free key at https://openrouter.ai/keys")
         return
     
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []  # type: ignore[attr-defined]
+    st.session_state.setdefault("chat_history", [])
 
     cols = st.columns([1, 1])
     with cols[0]:
@@ -116,13 +104,14 @@ def chat_ui(filtered_df: pd.DataFrame) -> None:
         st.session_state.chat_history.append({"role": "user", "content": user_msg})  # type: ignore[attr-defined]
         st.chat_message("user").write(user_msg)
         with st.chat_message("assistant"):
-            with st.spinner("Thinking…"):
-                try:
-                    answer = ask_ai(filtered_df, user_msg)
-                except Exception as e:
-                    st.error(f"AI request failed: {e}")
-                    return
-                st.write(answer)
-                st.session_state.chat_history.append({"role": "assistant", "content": answer})  # type: ignore[attr-defined]
+            try:
+                with st.spinner("Thinking…"):
+                    resp = _open_stream(filtered_df, user_msg)
+                # Render tokens as they arrive instead of waiting for the full body
+                answer = st.write_stream(iter_sse_content(resp))
+            except Exception as e:
+                st.error(f"AI request failed: {e}")
+                return
+            st.session_state.chat_history.append({"role": "assistant", "content": answer})  # type: ignore[attr-defined]
 
 
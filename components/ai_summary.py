@@ -1,28 +1,24 @@
 from __future__ import annotations
 
-import time
+import hashlib
 from typing import Dict
 
 import pandas as pd
-import requests
 import streamlit as st
+from pandas.util import hash_pandas_object
 
-from .utils import dataframe_to_compact_json
+from .utils import dataframe_to_compact_json, http_session, iter_sse_content, openrouter_api_key
 
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 FREE_MODEL = "moonshotai/kimi-k2:free"
 
-
-def _get_api_key() -> str | None:
-    try:
-        return st.secrets["openrouter"]["api_key"]  # type: ignore[index]
-    except Exception:
-        return None
+# Pooled keep-alive connection; 429/5xx are retried with backoff by the adapter
+_SESSION = http_session(retries=2, backoff_factor=0.5)
 
 
 def generate_ai_summary(df: pd.DataFrame) -> None:
     """Generate automatic AI summary of the filtered data"""
-    api_key = _get_api_key()
+    api_key = openrouter_api_key()
     
     if not api_key:
         st.info("💡 Add OpenRouter API key to secrets to enable AI summaries. Get a free key at https://openrouter.ai/keys")
@@ -32,8 +28,11 @@ def generate_ai_summary(df: pd.DataFrame) -> None:
         st.info("No data to summarize.")
         return
     
-    # Cache summary based on data hash
-    data_hash = str(hash(str(df.head(50).to_dict())))
+    # Cache summary based on data hash (C-level row hashes, no dict/repr round-trip)
+    h = hashlib.blake2b(digest_size=16)
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    h.update(hash_pandas_object(df.head(50), index=True).values.tobytes())
+    data_hash = h.hexdigest()
     cache_key = f"ai_summary_{data_hash}"
     
     if cache_key in st.session_state:
@@ -61,6 +60,7 @@ def generate_ai_summary(df: pd.DataFrame) -> None:
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
+            "stream": True,
         }
         
         headers = {
@@ -69,14 +69,17 @@ def generate_ai_summary(df: pd.DataFrame) -> None:
         }
         
         try:
-            resp = requests.post(OPENROUTER_URL, headers=headers, json=payload, timeout=30)
+            resp = _SESSION.post(OPENROUTER_URL, headers=headers, json=payload, stream=True, timeout=60)
             resp.raise_for_status()
-            data = resp.json()
-            summary = data["choices"][0]["message"]["content"].strip()
-            
-            # Cache the summary
-            st.session_state[cache_key] = summary
-            st.markdown(summary)
         except Exception as e:
             st.error(f"Failed to generate summary: {e}")
-
+            return
+    
+    try:
+        # Render the summary progressively as tokens arrive
+        summary = st.write_stream(iter_sse_content(resp))
+        
+        # Cache the summary
+        st.session_state[cache_key] = summary
+    except Exception as e:
+        st.error(f"Failed to generate summary: {e}")
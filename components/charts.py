@@ -1,20 +1,53 @@
 from __future__ import annotations
 
 import io
+import re
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-# Plotly imports - required for charts
-try:
+from .data_loader import canonical_columns
+from .utils import as_datetime, lowercase_labels, module_available
+
+# Plotly is required for charts; it is imported when the first chart is drawn
+PLOTLY_AVAILABLE = module_available("plotly")
+
+# PNG export goes through Kaleido; without it the download buttons are not shown.
+# Kaleido importing is not enough (it also needs Chrome and a matching Plotly), see _png_export_works.
+PNG_EXPORT_AVAILABLE = module_available("kaleido")
+
+# Shown instead of an empty figure when the filters leave no rows
+_NO_ROWS_MSG = "No tickets match the current filters."
+
+# Scatter points beyond this are downsampled server-side; more than the chart has pixels for
+_MAX_SCATTER_POINTS = 2000
+
+# Alphanumeric runs in Summary text; those with an uppercase letter (VP30, VAIA) are keywords
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]{2,}")
+
+# Lowercased status label -> progress funnel stage; anything else is "Other"
+_FUNNEL_STAGE = {
+    "pending": "Pending",
+    "backlog": "Pending",
+    "todo": "Pending",
+    "in progress": "In Progress",
+    "in-progress": "In Progress",
+    "inprogress": "In Progress",
+    "active": "Active",
+    "completed": "Completed",
+    "done": "Completed",
+    "closed": "Completed",
+}
+# Order: Pending -> In Progress -> Active -> Completed
+_FUNNEL_ORDER = ["Pending", "In Progress", "Active", "Completed", "Other"]
+
+
+def _px():
+    """plotly.express, imported on first use."""
     import plotly.express as px
-    import plotly.graph_objects as go
-    PLOTLY_AVAILABLE = True
-except ImportError:
-    PLOTLY_AVAILABLE = False
-    px = None  # type: ignore
-    go = None  # type: ignore
+    return px
 
 
 def _check_plotly() -> bool:
@@ -25,281 +58,326 @@ def _check_plotly() -> bool:
     return True
 
 
-def _download_button_for_figure(fig: go.Figure, filename: str, label: str = "Download PNG") -> None:
-    """Download button for Plotly figures. Silently fails if PNG export is unavailable."""
-    if not PLOTLY_AVAILABLE:
-        return
+@st.cache_data(show_spinner=False, max_entries=16, ttl=3600)
+def _figure_png(fig_json: str) -> bytes:
+    """Render a figure (as Plotly JSON) to PNG via Kaleido; repeat downloads of an unchanged chart are cached."""
+    import plotly.io as pio
+    return pio.from_json(fig_json).to_image(format="png", scale=2)
+
+
+@st.cache_resource(show_spinner=False)
+def _png_export_works() -> bool:
+    """Export a tiny figure once per process; False if Kaleido cannot actually render."""
     try:
-        png = fig.to_image(format="png", scale=2)
-        st.download_button(label, data=png, file_name=filename, mime="image/png")
+        import plotly.graph_objects as go
+        go.Figure().to_image(format="png", width=10, height=10)
+        return True
     except Exception:
-        # PNG export unavailable (Chrome/Kaleido not installed)
-        # Silently skip - don't show error to avoid cluttering the UI
-        # Users can still interact with the charts in the browser
-        pass
+        return False
+
+
+def _download_button_for_figure(fig_json: str, filename: str, label: str = "Download PNG") -> None:
+    """Download button for Plotly figures; the PNG is only rendered when the button is clicked."""
+    if not PLOTLY_AVAILABLE or not PNG_EXPORT_AVAILABLE or not _png_export_works():
+        # Users can still interact with the charts in the browser (and use the toolbar's PNG export)
+        return
+    st.download_button(label, data=lambda: _figure_png(fig_json), file_name=filename, mime="image/png")
+
+
+@st.cache_data(show_spinner=False, max_entries=64, ttl=3600)
+def _figure_json(kind: str, data: pd.DataFrame, layout: Optional[dict] = None, **kwargs) -> str:
+    """Build a Plotly Express figure from already-aggregated data and return it as JSON.
+
+    Keyed on the small aggregate and the arguments, so reruns that leave a chart's
+    input unchanged (most sidebar interactions) skip the Plotly Express pipeline.
+    """
+    fig = getattr(_px(), kind)(data, **kwargs)
+    if layout:
+        fig.update_layout(**layout)
+    return fig.to_json()
+
+
+def _render_figure(fig_json: str, filename: str) -> None:
+    import plotly.io as pio
+    st.plotly_chart(pio.from_json(fig_json), use_container_width=True)
+    _download_button_for_figure(fig_json, filename)
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: positions of ``n_out`` points that keep the shape of (x, y).
+
+    ``x`` must be sorted. The first and last points are always kept; from each bucket in
+    between, the point forming the largest triangle with the previously kept point and
+    the next bucket's average is chosen.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:nxt_end].mean()
+        avg_y = y[end:nxt_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    return idx
 
 
 def chart_projects_by_status(df: pd.DataFrame) -> None:
     if not _check_plotly():
         return
-    col = "Status" if "Status" in df.columns else ("status" if "status" in df.columns else None)
+    if df.empty:
+        st.info(_NO_ROWS_MSG)
+        return
+    col = canonical_columns(df).get("status")
     if not col:
         st.info("No status column found.")
         return
-    counts = df[col].value_counts().reset_index()
+    counts = df[col].value_counts().loc[lambda c: c > 0].reset_index()
     counts.columns = ["status", "count"]
-    fig = px.pie(counts, values="count", names="status", hole=0.4, title="Tickets by Status")
-    st.plotly_chart(fig, use_container_width=True)
-    _download_button_for_figure(fig, "projects_by_status.png")
+    fig_json = _figure_json("pie", counts, values="count", names="status", hole=0.4, title="Tickets by Status")
+    _render_figure(fig_json, "projects_by_status.png")
+
+
+@st.cache_data(show_spinner=False, max_entries=16, ttl=3600)
+def _keyword_counts(text: pd.DataFrame, summary_cols: tuple[str, ...], tag_cols: tuple[str, ...]) -> pd.Series:
+    """Count client keywords: tokens from Summary-like columns plus comma/semicolon-separated tags."""
+    found: list[pd.Series] = []
+    for col in summary_cols:
+        words = text[col].dropna().astype(str).str.findall(_TOKEN_RE).explode().dropna()
+        # A token counts once per ticket, however often its Summary repeats it
+        words = words.to_frame("word").reset_index().drop_duplicates()["word"]
+        found.append(words[words.str.contains("[A-Z]", regex=True)])
+    # Fallback to other columns
+    for col in tag_cols:
+        parts = text[col].dropna().astype(str).str.replace(";", ",").str.split(",").explode().str.strip()
+        found.append(parts[parts.fillna("") != ""])
+    if not found:
+        return pd.Series(dtype="int64")
+    return pd.concat(found, ignore_index=True).value_counts()
 
 
 def chart_projects_by_keywords(df: pd.DataFrame) -> None:
     if not _check_plotly():
         return
+    if df.empty:
+        st.info(_NO_ROWS_MSG)
+        return
     # Extract clients from Summary column first, then other columns
-    client_counts: dict[str, int] = {}
-    
-    # Priority: Summary column
-    summary_cols = [c for c in df.columns if "summary" in c.lower() or "description" in c.lower()]
-    for col in summary_cols:
-        for v in df[col].fillna("").astype(str):
-            words = v.split()
-            for word in words:
-                # Extract uppercase words/acronyms (likely client names)
-                if word.isupper() and len(word) >= 2:
-                    client_counts[word.strip()] = client_counts.get(word.strip(), 0) + 1
-                # Extract patterns like VP30, VAIA
-                cleaned = ''.join(c for c in word if c.isalnum())
-                if cleaned and len(cleaned) >= 2 and any(c.isupper() for c in cleaned):
-                    client_counts[cleaned] = client_counts.get(cleaned, 0) + 1
-    
-    # Fallback to other columns
-    for col in df.columns:
-        if any(k in col.lower() for k in ["client", "customer", "account", "keyword", "tag"]):
-            for v in df[col].fillna("").astype(str):
-                parts = [p.strip() for p in v.replace(";", ",").split(",") if p.strip()]
-                for p in parts:
-                    client_counts[p] = client_counts.get(p, 0) + 1
+    summary_cols = tuple(c for c in df.columns if "summary" in c.lower() or "description" in c.lower())
+    tag_cols = tuple(c for c in df.columns if any(k in c.lower() for k in ["client", "customer", "account", "keyword", "tag"]))
+    # Only the text columns are hashed for the cache key
+    client_counts = _keyword_counts(df[list(dict.fromkeys(summary_cols + tag_cols))], summary_cols, tag_cols)
     
-    if not client_counts:
+    if client_counts.empty:
         st.info("No client-related data detected.")
         return
-    counts = pd.DataFrame({"client": list(client_counts.keys()), "count": list(client_counts.values())})
-    counts = counts.sort_values("count", ascending=False).head(20)  # Top 20
-    fig = px.bar(counts, x="client", y="count", title="Tickets by Keywords", color="count", color_continuous_scale="viridis")
-    fig.update_layout(xaxis_title="Keywords", yaxis_title="Tickets")
-    st.plotly_chart(fig, use_container_width=True)
-    _download_button_for_figure(fig, "projects_by_keywords.png")
+    counts = client_counts.head(20).rename_axis("client").reset_index(name="count")  # Top 20
+    fig_json = _figure_json(
+        "bar", counts, x="client", y="count", title="Tickets by Keywords", color="count", color_continuous_scale="viridis",
+        layout={"xaxis_title": "Keywords", "yaxis_title": "Tickets"},
+    )
+    _render_figure(fig_json, "projects_by_keywords.png")
 
 
 def chart_created_vs_due_date(df: pd.DataFrame) -> None:
     if not _check_plotly():
         return
+    if df.empty:
+        st.info(_NO_ROWS_MSG)
+        return
     # Find created and due date columns
-    created_col = None
-    due_col = None
-    
-    for c in df.columns:
-        c_lower = c.lower()
-        if "created" in c_lower and created_col is None:
-            created_col = c
-        if "due" in c_lower and due_col is None:
-            due_col = c
+    cols = canonical_columns(df)
+    created_col = cols.get("created")
+    due_col = cols.get("due")
     
     if not created_col or not due_col:
         st.info("Need both 'Created' and 'Due' date columns for scatter plot.")
         return
     
-    sdf = df.copy()
-    sdf["created_dt"] = pd.to_datetime(sdf[created_col], errors="coerce")
-    sdf["due_dt"] = pd.to_datetime(sdf[due_col], errors="coerce")
-    sdf = sdf.dropna(subset=["created_dt", "due_dt"]).copy()
+    created_dt = as_datetime(df[created_col])
+    due_dt = as_datetime(df[due_col])
+    mask = created_dt.notna() & due_dt.notna()
     
-    if sdf.empty:
+    if not mask.any():
         st.info("No valid created/due dates to plot.")
         return
     
     # Add status for color coding if available
-    status_col = None
-    for c in df.columns:
-        if c.lower() == "status":
-            status_col = c
-            break
+    status_col = cols.get("status")
+    
+    # Plot frame holds only the columns the figure uses, not a copy of the whole sheet
+    hover_cols = [c for c in df.columns if c not in [created_col, due_col]][:3] if status_col else []
+    plot_cols = list(dict.fromkeys(([status_col] if status_col else []) + hover_cols))
+    sdf = df.loc[mask, plot_cols].assign(created_dt=created_dt[mask], due_dt=due_dt[mask])
+    if len(sdf) > _MAX_SCATTER_POINTS:
+        # Downsample before Plotly: the browser only needs about as many points as pixels
+        sdf = sdf.sort_values("created_dt", kind="stable")
+        keep = _lttb_indices(
+            sdf["created_dt"].to_numpy(dtype="int64").astype(float),
+            sdf["due_dt"].to_numpy(dtype="int64").astype(float),
+            _MAX_SCATTER_POINTS,
+        )
+        st.caption(f"Showing {len(keep)} of {len(sdf)} tickets (downsampled)")
+        sdf = sdf.iloc[keep]
     
     if status_col:
-        fig = px.scatter(
+        fig_json = _figure_json(
+            "scatter",
             sdf,
             x="created_dt",
             y="due_dt",
             color=status_col,
             title="Created Date vs Due Date",
             labels={"created_dt": "Created Date", "due_dt": "Due Date"},
-            hover_data=[c for c in df.columns if c not in [created_col, due_col]][:3],
+            render_mode="webgl",
+            hover_data=hover_cols,
         )
     else:
-        fig = px.scatter(
+        fig_json = _figure_json(
+            "scatter",
             sdf,
             x="created_dt",
             y="due_dt",
             title="Created Date vs Due Date",
             labels={"created_dt": "Created Date", "due_dt": "Due Date"},
+            render_mode="webgl",
         )
     
-    st.plotly_chart(fig, use_container_width=True)
-    _download_button_for_figure(fig, "created_vs_due_date.png")
+    _render_figure(fig_json, "created_vs_due_date.png")
 
 
 def chart_by_resource(df: pd.DataFrame) -> None:
     if not _check_plotly():
         return
+    if df.empty:
+        st.info(_NO_ROWS_MSG)
+        return
     # Use Assignee column specifically
-    resource_col = None
-    for c in df.columns:
-        if c.lower() == "assignee":
-            resource_col = c
-            break
+    cols = canonical_columns(df)
+    resource_col = cols.get("resource")
     if resource_col is None:
         st.info("No 'Assignee' column found.")
         return
 
-    status_col = None
-    for c in df.columns:
-        if c.lower() in ("status",):
-            status_col = c
-            break
-        if "status" in c.lower():
-            status_col = c
-            break
+    status_col = cols.get("status")
 
     # Normalize values
-    rdf = df.copy()
-    rdf[resource_col] = rdf[resource_col].fillna("(unassigned)").astype(str)
+    resource = df[resource_col].astype("string").fillna("(unassigned)")
 
     # 1) Workload by resource (count of tickets)
-    counts = rdf.groupby(resource_col).size().reset_index(name="tickets")
+    counts = resource.groupby(resource).size().rename_axis(resource_col).reset_index(name="tickets")
     counts = counts.sort_values("tickets", ascending=False)
-    fig1 = px.bar(counts, x=resource_col, y="tickets", title="Tickets by Resource")
-    fig1.update_layout(xaxis_title="Resource", yaxis_title="Tickets")
-    st.plotly_chart(fig1, use_container_width=True)
-    _download_button_for_figure(fig1, "tickets_by_resource.png")
+    fig_json = _figure_json(
+        "bar", counts, x=resource_col, y="tickets", title="Tickets by Resource",
+        layout={"xaxis_title": "Resource", "yaxis_title": "Tickets"},
+    )
+    _render_figure(fig_json, "tickets_by_resource.png")
 
     # 2) Stacked by status per resource (if status available)
     if status_col is not None:
-        sdf = rdf.copy()
-        sdf[status_col] = sdf[status_col].fillna("(unknown)").astype(str)
-        fig2 = px.bar(
-            sdf,
+        status = df[status_col].astype("string").fillna("(unknown)")
+        # One bar segment per (resource, status) pair instead of one row per ticket
+        stacked = resource.groupby([resource, status]).size()
+        stacked = stacked.rename_axis([resource_col, status_col]).reset_index(name="tickets")
+        fig_json = _figure_json(
+            "bar",
+            stacked,
             x=resource_col,
+            y="tickets",
             color=status_col,
             title="Tickets by Resource and Status",
+            layout={"xaxis_title": "Resource", "yaxis_title": "Tickets"},
         )
-        fig2.update_layout(xaxis_title="Resource", yaxis_title="Tickets")
-        st.plotly_chart(fig2, use_container_width=True)
-        _download_button_for_figure(fig2, "tickets_by_resource_status.png")
+        _render_figure(fig_json, "tickets_by_resource_status.png")
 
 
 def chart_status_over_time(df: pd.DataFrame) -> None:
+    """Status distribution over time"""
     if not _check_plotly():
         return
-    """Status distribution over time"""
-    date_col = None
-    status_col = None
-    
-    for c in df.columns:
-        if "created" in c.lower() or ("date" in c.lower() and date_col is None):
-            date_col = c
-        if c.lower() == "status":
-            status_col = c
+    if df.empty:
+        st.info(_NO_ROWS_MSG)
+        return
+    # Prefer the created date, else the first date-like column
+    cols = canonical_columns(df)
+    date_col = cols.get("created") or cols.get("date")
+    status_col = cols.get("status")
     
     if not date_col or not status_col:
         st.info("Need date and status columns for this chart.")
         return
     
-    tdf = df.copy()
-    tdf["dt"] = pd.to_datetime(tdf[date_col], errors="coerce")
-    tdf = tdf.dropna(subset=["dt", status_col]).copy()
+    dt = as_datetime(df[date_col])
+    mask = dt.notna() & df[status_col].notna()
     
-    if tdf.empty:
+    if not mask.any():
         st.info("No valid data for status over time.")
         return
     
-    tdf["month"] = tdf["dt"].dt.to_period("M").astype(str)
-    counts = tdf.groupby([status_col, "month"]).size().reset_index(name="count")
+    # Bin by calendar month inside groupby, then label the bins; empty bins are dropped
+    tdf = pd.DataFrame({status_col: df.loc[mask, status_col], "dt": dt[mask]})
+    counts = tdf.groupby([status_col, pd.Grouper(key="dt", freq="MS")], observed=True).size()
+    counts = counts[counts > 0].reset_index(name="count")
+    counts["month"] = counts.pop("dt").dt.strftime("%Y-%m")
     
-    fig = px.line(counts, x="month", y="count", color=status_col, markers=True, title="Status Distribution Over Time")
-    st.plotly_chart(fig, use_container_width=True)
-    _download_button_for_figure(fig, "status_over_time.png")
+    fig_json = _figure_json("line", counts, x="month", y="count", color=status_col, markers=True, title="Status Distribution Over Time")
+    _render_figure(fig_json, "status_over_time.png")
 
 
 def chart_priority_breakdown(df: pd.DataFrame) -> None:
+    """Priority/severity breakdown if available"""
     if not _check_plotly():
         return
-    """Priority/severity breakdown if available"""
-    priority_col = None
-    for c in df.columns:
-        if "priority" in c.lower() or "severity" in c.lower():
-            priority_col = c
-            break
+    if df.empty:
+        st.info(_NO_ROWS_MSG)
+        return
+    priority_col = canonical_columns(df).get("priority")
     
     if not priority_col:
         st.info("No priority/severity column found.")
         return
     
-    counts = df[priority_col].value_counts().reset_index()
+    counts = df[priority_col].value_counts().loc[lambda c: c > 0].reset_index()
     counts.columns = ["priority", "count"]
     
-    fig = px.bar(counts, x="priority", y="count", title="Tickets by Priority", color="priority")
-    st.plotly_chart(fig, use_container_width=True)
-    _download_button_for_figure(fig, "priority_breakdown.png")
+    fig_json = _figure_json("bar", counts, x="priority", y="count", title="Tickets by Priority", color="priority")
+    _render_figure(fig_json, "priority_breakdown.png")
 
 
 def chart_progress_funnel(df: pd.DataFrame) -> None:
+    """Funnel chart showing ticket progression"""
     if not _check_plotly():
         return
-    """Funnel chart showing ticket progression"""
-    status_col = None
-    for c in df.columns:
-        if c.lower() == "status":
-            status_col = c
-            break
+    if df.empty:
+        st.info(_NO_ROWS_MSG)
+        return
+    status_col = canonical_columns(df).get("status")
     
     if not status_col:
         st.info("Need status column for funnel chart.")
         return
     
-    # Categorize statuses
-    status_map = {
-        "pending": "Pending",
-        "backlog": "Pending",
-        "todo": "Pending",
-        "in progress": "In Progress",
-        "in-progress": "In Progress",
-        "inprogress": "In Progress",
-        "active": "Active",
-        "completed": "Completed",
-        "done": "Completed",
-        "closed": "Completed",
-    }
-    
-    sdf = df.copy()
-    sdf["category"] = sdf[status_col].astype(str).str.lower().map(status_map).fillna("Other")
-    counts = sdf["category"].value_counts().reset_index()
+    # Mapped by category; a categorical result cannot take the new "Other" label directly
+    category = lowercase_labels(df[status_col]).map(_FUNNEL_STAGE).astype(object).fillna("Other")
+    # Stages in funnel order; stages with no tickets are left out, as before
+    counts = category.value_counts().reindex(_FUNNEL_ORDER).dropna().astype(int).reset_index()
     counts.columns = ["stage", "count"]
     
-    # Order: Pending -> In Progress -> Active -> Completed
-    order = ["Pending", "In Progress", "Active", "Completed", "Other"]
-    counts["stage"] = pd.Categorical(counts["stage"], categories=order, ordered=True)
-    counts = counts.sort_values("stage")
-    
-    fig = px.funnel(
+    fig_json = _figure_json(
+        "funnel",
         counts,
         x="count",
         y="stage",
         title="Ticket Progress Funnel",
         color="stage",
+        layout={"yaxis_title": "Stage", "xaxis_title": "Number of Tickets"},
     )
-    fig.update_layout(yaxis_title="Stage", xaxis_title="Number of Tickets")
-    st.plotly_chart(fig, use_container_width=True)
-    _download_button_for_figure(fig, "progress_funnel.png")
+    _render_figure(fig_json, "progress_funnel.png")
 
 
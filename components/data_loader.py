@@ -1,22 +1,25 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+import json
+import re
 import time
+import warnings
+from pathlib import Path
 from typing import Tuple, Optional
 import io
 import requests
 
+import numpy as np
 import pandas as pd
 import streamlit as st
+from pandas.tseries.api import guess_datetime_format
 
-# Optional imports for Google Sheets API (only needed if using service account)
-try:
-    import gspread
-    from google.oauth2.service_account import Credentials
-    GSPREAD_AVAILABLE = True
-except ImportError:
-    GSPREAD_AVAILABLE = False
-    gspread = None  # type: ignore
-    Credentials = None  # type: ignore
+from .utils import http_session, module_available
+
+# Google Sheets API (only needed if using service account); imported in _get_client
+GSPREAD_AVAILABLE = module_available("gspread") and module_available("google.oauth2")
 
 
 SCOPES = [
@@ -24,14 +27,169 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive.readonly",
 ]
 
+# One keep-alive session for every sheet request, so refreshes reuse the TLS connection
+_SESSION = http_session(retries=2, backoff_factor=0.3, allowed_methods=("GET", "HEAD"))
+
+# Parsed sheets are persisted here as Parquet so restarts can skip the download and parse
+CACHE_DIR = Path.home() / ".cache" / "rnd-app"
+# Source URL -> {"validator": ETag/Last-Modified, "hash": Parquet file name}
+_CACHE_INDEX = CACHE_DIR / "index.json"
+
+# pyarrow's multithreaded CSV reader when installed, else pandas' C parser
+_CSV_ENGINE = "pyarrow" if module_available("pyarrow") else "c"
+# Column-name words that mark a text column as a candidate date column
+_DATE_HINTS = frozenset({"date", "created", "due", "start", "end", "updated", "resolved"})
+# Assignee/priority columns with fewer distinct labels than this (or 5% of rows) become categoricals
+_CATEGORY_MAX_LABELS = 50
+# Share of non-null cells that must parse before a date-named column is typed as datetime
+_DATE_MIN_PARSED = 0.5
+# Target dtype for text columns; also marks columns a previous load already optimized
+_ARROW_STRING = pd.StringDtype("pyarrow")
+
+
+def _coerce_dates(s: pd.Series, non_null: int) -> Optional[pd.Series]:
+    """Parse a date-named text column once at load; None if it does not look like dates.
+
+    The format is guessed from the first value and passed explicitly, which avoids
+    per-element inference; stray notes such as "TBD" become NaT, as they would in
+    every chart and filter that reads the column.
+    """
+    first = s.loc[s.first_valid_index()]
+    with warnings.catch_warnings():
+        # dayfirst only breaks ties; pandas still warns when the first value is
+        # unambiguously day-first, which is exactly the format we want back
+        warnings.simplefilter("ignore", UserWarning)
+        fmt = guess_datetime_format(str(first), dayfirst=False) or "mixed"
+    dt = pd.to_datetime(s, errors="coerce", format=fmt)
+    failed = dt.isna() & s.notna()
+    if fmt != "mixed" and failed.any():
+        # Mixed formats in one sheet: parse only the cells the guessed format rejected,
+        # so dates it did parse keep its day/month order
+        dt[failed] = pd.to_datetime(s[failed], errors="coerce", format="mixed")
+    if int(dt.notna().sum()) < non_null * _DATE_MIN_PARSED:
+        return None
+    return dt
+
+
+def _round_trips(s: pd.Series, num: pd.Series) -> bool:
+    """True when every non-null cell of ``s`` prints back exactly as its parsed number.
+
+    Rejects IDs like "007" and versions like "1.10" that to_numeric would silently
+    rewrite. Whole numbers in a float column (blank cells, or mixed with decimals)
+    are printed as ints.
+    """
+    present = s.notna()
+    values = num[present].to_numpy()
+    printed = values.astype(str).astype(object)
+    if values.dtype.kind == "f":
+        whole = np.abs(values) < 2**53  # Also False for NaN/inf
+        whole[whole] = values[whole] % 1 == 0
+        printed[whole] = values[whole].astype("int64").astype(str)
+    text = s[present].astype(str).str.strip().to_numpy()
+    return bool((printed == text).all())
+
+
+def _optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Replace object columns with compact dtypes: numbers, datetimes, else Arrow-backed strings."""
+    # "string" selects pandas 3's default str dtype without the deprecated "object" fallback
+    for col in df.select_dtypes(include=["object", "string"]).columns:
+        s = df[col]
+        if s.dtype == _ARROW_STRING:
+            continue  # Already optimized (e.g. a frame read back from the Parquet cache)
+        non_null = int(s.notna().sum())
+        if non_null:
+            # Numbers only convert when every non-null cell parses back to its own text
+            num = pd.to_numeric(s, errors="coerce", downcast="unsigned")
+            if int(num.notna().sum()) == non_null and _round_trips(s, num):
+                df[col] = num
+                continue
+            # Whole words only, so "Spend", "Agenda" or "Backend" are not date candidates
+            if _DATE_HINTS.intersection(re.split(r"[\W_]+", str(col).lower())):
+                dt = _coerce_dates(s, non_null)
+                if dt is not None:
+                    df[col] = dt
+                    continue
+        df[col] = s.astype(_ARROW_STRING)
+    return df
+
+
+def canonical_columns(df: pd.DataFrame) -> dict[str, str]:
+    """Map canonical roles to actual column names (first matching column wins).
+
+    Roles: status, priority, resource (assignee), created, due, and for the report's
+    schedule charts start, end, label (project/name/title, else the first column) and date.
+    """
+    return dict(_canonical_for(tuple(df.columns)))
+
+
+@functools.lru_cache(maxsize=32)
+def _canonical_for(columns: tuple) -> dict[str, str]:
+    canonical: dict[str, str] = {}
+    for col in columns:
+        c_lower = str(col).lower()
+        if c_lower == "status":
+            canonical.setdefault("status", col)
+        if "priority" in c_lower or "severity" in c_lower:
+            canonical.setdefault("priority", col)
+        if c_lower == "assignee":
+            canonical.setdefault("resource", col)
+        if "created" in c_lower:
+            canonical.setdefault("created", col)
+        if "due" in c_lower:
+            canonical.setdefault("due", col)
+        if "start" in c_lower or c_lower == "date":
+            canonical.setdefault("start", col)
+        if "end" in c_lower:
+            canonical.setdefault("end", col)
+        if c_lower in ("project", "name", "title"):
+            canonical.setdefault("label", col)
+        if "date" in c_lower or c_lower in ("created", "start"):
+            canonical.setdefault("date", col)
+    if columns:
+        canonical.setdefault("label", columns[0])
+    return canonical
+
+
+def _categorize_labels(df: pd.DataFrame) -> pd.DataFrame:
+    """Store the status column, and low-cardinality assignee/priority text, as categoricals of trimmed labels.
+
+    These are a handful of distinct labels, so counts and groupbys become histograms
+    over small integer codes and label normalization only has to touch the categories.
+    Assignee/priority text with too many labels stays as Arrow-backed strings, whose
+    value_counts/isin run in Arrow's kernels rather than hashing Python objects.
+    """
+    canonical = df.attrs["canonical"]
+    for role in ("status", "resource", "priority"):
+        col = canonical.get(role)
+        if col is None or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        if role != "status":
+            if not pd.api.types.is_string_dtype(df[col]):
+                continue
+            if df[col].nunique() >= max(_CATEGORY_MAX_LABELS, len(df) // 20):
+                df[col] = df[col].astype("string[pyarrow]")
+                continue
+        df[col] = df[col].astype("string[pyarrow]").str.strip().astype("category")
+    return df
+
+
+def _prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a freshly loaded sheet once, before it is cached or rendered."""
+    df.columns = [str(c).strip() for c in df.columns]
+    # Resolved once here; df.attrs travels with every filtered view/copy of the frame
+    df.attrs["canonical"] = canonical_columns(df)
+    df = _optimize_dtypes(df)
+    return _categorize_labels(df)
+
+
 def _demo_df() -> pd.DataFrame:
-    return pd.DataFrame([
+    return _prepare_frame(pd.DataFrame([
         {"Project": "Orion Compute", "Status": "In Progress", "Client": "Acme", "Start": "2025-07-01", "End": "2026-02-15"},
         {"Project": "Nova Analytics", "Status": "Pending", "Client": "Globex", "Start": "2025-09-10", "End": "2026-03-30"},
         {"Project": "Quasar Edge", "Status": "Blocked", "Client": "Initech", "Start": "2025-05-12", "End": "2026-01-20"},
         {"Project": "Helix Studio", "Status": "Completed", "Client": "Acme", "Start": "2025-01-10", "End": "2025-12-10"},
         {"Project": "Atlas Sync", "Status": "In Progress", "Client": "Umbrella", "Start": "2025-08-01", "End": "2026-05-12"},
-    ])
+    ]))
 
 
 def _get_client():
@@ -44,8 +202,68 @@ def _get_client():
         info = None
     if not info:
         raise RuntimeError("Missing gcp_service_account in secrets")
+    import gspread
+    from google.oauth2.service_account import Credentials
     creds = Credentials.from_service_account_info(info, scopes=SCOPES)
-    return gspread.authorize(creds)  # type: ignore
+    return gspread.authorize(creds)
+
+
+def _read_csv_response(resp: requests.Response) -> pd.DataFrame:
+    """Parse a streamed CSV response straight off the socket, without buffering it as text."""
+    # Let urllib3 undo any gzip/deflate transfer encoding while pandas reads
+    resp.raw.decode_content = True
+    try:
+        return pd.read_csv(resp.raw, engine=_CSV_ENGINE)
+    finally:
+        resp.close()
+
+
+# URL -> (Parquet name, parsed frame) for this process, so a 304 skips even the Parquet read
+_etag_cache: dict[str, tuple[str, pd.DataFrame]] = {}
+
+
+def _fetch_csv(url: str) -> pd.DataFrame:
+    """Download and parse a CSV sheet export, reusing the on-disk Parquet copy while it is unchanged.
+
+    The last response's ETag/Last-Modified are sent back as a conditional GET; a 304 means
+    the cached frame is current, so a new session or a restarted server skips both the
+    download and the parse. Raises HTTPError, or EmptyDataError/ParserError for an empty
+    export (pandas' C parser and the pyarrow engine report it differently).
+    """
+    index = _read_cache_index()
+    entry = index.get(url) or {}
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    resp = _SESSION.get(url, headers=headers, timeout=5, stream=True)
+    if resp.status_code == 304:
+        resp.close()
+        name = entry.get("hash", "")
+        memo = _etag_cache.get(url)
+        if memo is not None and memo[0] == name:
+            return memo[1]
+        cached = _read_cached_frame(name)
+        if cached is not None:
+            df = _prepare_frame(cached)
+            _etag_cache[url] = (name, df)
+            return df
+        # The Parquet copy is gone: fetch the sheet unconditionally
+        resp = _SESSION.get(url, timeout=5, stream=True)
+    if not resp.ok:
+        resp.close()
+    resp.raise_for_status()
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    df = _prepare_frame(_read_csv_response(resp))
+    if etag or last_modified:
+        name = "csv-" + hashlib.sha1(f"{url}\x1f{etag or last_modified}".encode()).hexdigest()[:16]
+        _write_cached_frame(name, df)
+        _replace_cache_entry(index, url, {"etag": etag, "last_modified": last_modified, "hash": name})
+        _etag_cache[url] = (name, df)
+    return df
 
 
 @st.cache_data(ttl=60, show_spinner=True)
@@ -65,8 +283,12 @@ def fetch_sheet(spreadsheet_key: str, gid: Optional[int] = None) -> Tuple[pd.Dat
                 ws = sh.get_worksheet(0)
             if ws is None:
                 return pd.DataFrame(), time.time()
-            records = ws.get_all_records()
-            df = pd.DataFrame(records)
+            # One list-of-lists fetch instead of gspread building a dict per row;
+            # blank cells become missing and _prepare_frame types the columns
+            rows = ws.get_all_values()
+            if not rows:
+                return pd.DataFrame(), time.time()
+            df = _prepare_frame(pd.DataFrame(rows[1:], columns=rows[0]).replace("", None))
             return df, time.time()
         except Exception:
             pass  # Fall through to public CSV method
@@ -81,16 +303,13 @@ def fetch_sheet(spreadsheet_key: str, gid: Optional[int] = None) -> Tuple[pd.Dat
                 gid_val = 0
         # Attempt export endpoint
         export_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_key}/export?format=csv&gid={gid_val}"
-        resp = requests.get(export_url, timeout=5)
-        if resp.status_code == 200 and resp.text.strip():
-            df = pd.read_csv(io.StringIO(resp.text))
-            return df, time.time()
+        try:
+            return _fetch_csv(export_url), time.time()
+        except (requests.HTTPError, pd.errors.EmptyDataError, pd.errors.ParserError):
+            pass  # Not exported or empty: try the published endpoint
         # Attempt published endpoint (requires File → Share → Publish to web)
         pub_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_key}/pub?output=csv&gid={gid_val}"
-        resp2 = requests.get(pub_url, timeout=5)
-        resp2.raise_for_status()
-        df = pd.read_csv(io.StringIO(resp2.text))
-        return df, time.time()
+        return _fetch_csv(pub_url), time.time()
     except Exception as e:
         # Provide clearer guidance for common 400/403 cases
         if isinstance(e, requests.HTTPError) and e.response is not None:
@@ -113,29 +332,102 @@ def fetch_sheet(spreadsheet_key: str, gid: Optional[int] = None) -> Tuple[pd.Dat
         return _demo_df(), time.time()
 
 
-# Check if openpyxl is available at module level
-try:
-    import openpyxl  # noqa: F401
-    OPENPYXL_AVAILABLE = True
-except ImportError:
-    OPENPYXL_AVAILABLE = False
+# Check if openpyxl is available at module level; read_excel imports it when an XLSX is parsed
+OPENPYXL_AVAILABLE = module_available("openpyxl")
+
+
+def _read_cached_frame(name: str) -> Optional[pd.DataFrame]:
+    path = CACHE_DIR / f"{name}.parquet"
+    if not path.exists():
+        return None
+    try:
+        return pd.read_parquet(path, engine="pyarrow")
+    except Exception:
+        return None
+
+
+def _write_cached_frame(name: str, df: pd.DataFrame) -> None:
+    # Best effort: a read-only home or a mixed-type object column just means no cache
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(CACHE_DIR / f"{name}.parquet", engine="pyarrow", compression="zstd", index=False)
+    except Exception:
+        pass
+
+
+def _read_cache_index() -> dict:
+    try:
+        return json.loads(_CACHE_INDEX.read_text())
+    except Exception:
+        return {}
+
+
+def _write_cache_index(index: dict) -> None:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _CACHE_INDEX.write_text(json.dumps(index))
+    except Exception:
+        pass
+
+
+def _replace_cache_entry(index: dict, url: str, entry: dict) -> None:
+    """Point ``url`` at a new Parquet file, deleting the one it supersedes unless another URL still uses it."""
+    old = (index.get(url) or {}).get("hash")
+    index[url] = entry
+    if old and old != entry["hash"] and all(e.get("hash") != old for e in index.values()):
+        try:
+            (CACHE_DIR / f"{old}.parquet").unlink(missing_ok=True)
+        except OSError:
+            pass
+    _write_cache_index(index)
 
 
 def _load_published_xlsx(published_url: str) -> Tuple[pd.DataFrame, float]:
-    """Load XLSX from published URL. Requires openpyxl."""
+    """Load XLSX from published URL. Requires openpyxl.
+
+    Parsed frames are cached on disk as Parquet keyed by a hash of the XLSX bytes;
+    the URL's ETag/Last-Modified is remembered so an unchanged sheet skips the download too.
+    """
     if not OPENPYXL_AVAILABLE:
         raise ImportError(
             "openpyxl is required to read XLSX files. Please install it: pip install openpyxl"
         )
     
+    # Cheap HEAD first: if the validator matches the last download, reuse its Parquet
+    validator = None
+    try:
+        head = _SESSION.head(published_url, timeout=5, allow_redirects=True)
+        validator = head.headers.get("ETag") or head.headers.get("Last-Modified")
+    except Exception:
+        validator = None
+    index = _read_cache_index()
+    entry = index.get(published_url) or {}
+    if validator and entry.get("validator") == validator:
+        cached = _read_cached_frame(entry.get("hash", ""))
+        if cached is not None:
+            # Idempotent and cheap on an already-prepared frame; refreshes attrs for older files
+            return _prepare_frame(cached), time.time()
+    
     # Use shorter timeout to fail fast
-    resp = requests.get(published_url, timeout=10)
+    resp = _SESSION.get(published_url, timeout=10)
     resp.raise_for_status()
-    bio = io.BytesIO(resp.content)
-    try:
-        df = pd.read_excel(bio, engine='openpyxl')
-    except Exception as e:
-        raise RuntimeError(f"Failed to parse XLSX file: {e}") from e
+    content_hash = hashlib.sha1(resp.content).hexdigest()[:16]
+    df = _read_cached_frame(content_hash)
+    if df is not None:
+        df = _prepare_frame(df)
+    else:
+        bio = io.BytesIO(resp.content)
+        try:
+            df = pd.read_excel(bio, engine='openpyxl')
+        except Exception as e:
+            raise RuntimeError(f"Failed to parse XLSX file: {e}") from e
+        df = _prepare_frame(df)
+        _write_cached_frame(content_hash, df)
+    
+    validator = validator or resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+    # Recorded even without a validator, so the superseded Parquet file is still found and deleted
+    if entry.get("validator") != validator or entry.get("hash") != content_hash:
+        _replace_cache_entry(index, published_url, {"validator": validator, "hash": content_hash})
     return df, time.time()
 
 
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import re
 from typing import List, Tuple
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from .utils import count_active_filters, extract_clients, find_date_columns
+from .utils import as_datetime, count_active_filters, extract_clients, find_date_columns
 
 
 def sidebar_filters(df: pd.DataFrame) -> tuple[list[str], list[str], str, tuple[pd.Timestamp | None, pd.Timestamp | None]]:
@@ -37,7 +39,7 @@ def sidebar_filters(df: pd.DataFrame) -> tuple[list[str], list[str], str, tuple[
         else:
             date_range = (default_start, default_end)
 
-    query = st.sidebar.text_input("Search (all columns)")
+    query = st.sidebar.text_input("Search (text columns)", help="Matches text, status and label columns; numbers and dates are not searched")
 
     c1, c2, c3 = st.sidebar.columns([1, 1, 1])
     with c1:
@@ -64,47 +66,53 @@ def apply_dataframe_filters(
     query: str,
     date_range: Tuple[pd.Timestamp | None, pd.Timestamp | None],
 ) -> pd.DataFrame:
-    out = df.copy()
+    # Each stage ANDs its row mask into one composite mask, so rows are selected only once
+    mask = np.ones(len(df), dtype=bool)
     # Status
     if status_pick:
-        col = "Status" if "Status" in out.columns else ("status" if "status" in out.columns else None)
+        col = "Status" if "Status" in df.columns else ("status" if "status" in df.columns else None)
         if col:
-            out = out[out[col].astype(str).isin(status_pick)]
+            # The loaded status column is categorical: isin matches codes, no per-row strings
+            status = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype(str)
+            mask &= status.isin(status_pick).to_numpy(dtype=bool)
     # Keywords (search in Summary first, then other columns)
     if keyword_pick:
-        mask = pd.Series(False, index=out.index)
-        # Priority: Summary column
-        summary_cols = [c for c in out.columns if "summary" in c.lower() or "description" in c.lower()]
-        for col in summary_cols:
-            col_series = out[col].fillna("").astype(str)
-            for kp in keyword_pick:
-                mask = mask | col_series.str.contains(kp, case=False, regex=False)
-        # Fallback to other columns
-        for col in out.columns:
-            if any(k in col.lower() for k in ["client", "customer", "account", "keyword", "tag"]):
-                col_series = out[col].fillna("").astype(str)
-                for kp in keyword_pick:
-                    mask = mask | col_series.str.contains(kp, case=False, regex=False)
-        out = out[mask]
+        keyword_mask = np.zeros(len(df), dtype=bool)
+        # All picked keywords as one case-insensitive alternation: a single scan per column
+        pattern = re.compile("|".join(re.escape(kp) for kp in keyword_pick), re.IGNORECASE)
+        # Priority: Summary column, then client/tag-like columns
+        search_cols = [c for c in df.columns if "summary" in c.lower() or "description" in c.lower()]
+        search_cols += [
+            c for c in df.columns
+            if c not in search_cols and any(k in c.lower() for k in ["client", "customer", "account", "keyword", "tag"])
+        ]
+        for col in search_cols:
+            keyword_mask |= df[col].astype("string").str.contains(pattern, na=False).to_numpy(dtype=bool)
+        mask &= keyword_mask
     # Date range - apply to created date or first date column
     if date_range and any(date_range):
         start, end = date_range
         # Prefer created date, then any date column
-        date_cols = [c for c in out.columns if "created" in c.lower()]
+        date_cols = [c for c in df.columns if "created" in c.lower()]
         if not date_cols:
-            date_cols = [c for c in out.columns if "date" in c.lower() or c.lower() in ("start", "end")]
+            date_cols = [c for c in df.columns if "date" in c.lower() or c.lower() in ("start", "end")]
         if date_cols:
             dc = date_cols[0]
-            s = pd.to_datetime(out[dc], errors="coerce")
+            s = as_datetime(df[dc])
             if start is not None:
-                out = out[s >= pd.to_datetime(start)]
+                mask &= (s >= pd.to_datetime(start)).to_numpy(dtype=bool)
             if end is not None:
-                out = out[s <= pd.to_datetime(end)]
-    # Query across all columns
+                mask &= (s <= pd.to_datetime(end)).to_numpy(dtype=bool)
+    # Query across all text columns (numbers and dates are not free-text searched)
     if query and query.strip():
         q = query.strip().lower()
-        contains = out.apply(lambda row: any(q in str(v).lower() for v in row.values), axis=1)
-        out = out[contains]
-    return out
+        text = df.select_dtypes(include=["object", "string", "category"])
+        # One vectorized substring pass per column, OR-ed into a single row mask
+        contains = np.zeros(len(df), dtype=bool)
+        for col in text.columns:
+            col_series = text[col] if isinstance(text[col].dtype, pd.StringDtype) else text[col].astype("string")
+            contains |= col_series.str.contains(q, case=False, regex=False, na=False).to_numpy(dtype=bool)
+        mask &= contains
+    return df[mask]
 
 
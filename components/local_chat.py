@@ -1,134 +1,144 @@
 from __future__ import annotations
 
+import re
+
 import pandas as pd
 import streamlit as st
 from datetime import datetime
 
+from .data_loader import canonical_columns
+from .utils import ACTIVE_STATUSES, DONE_STATUSES, IN_PROGRESS_STATUSES, PENDING_STATUSES, as_datetime, lowercase_labels
+
+# Intent -> (trigger words, trigger phrases); the first intent the question mentions wins
+_INTENT_TRIGGERS = {
+    "count": (frozenset({"count", "counts", "total"}), ("how many", "number of")),
+    "who": (frozenset({"who", "assignee", "assignees", "assigned", "owner", "owners"}), ()),
+    "status": (frozenset({"status", "statuses", "states"}), ()),
+    "priority": (frozenset({"priority", "priorities", "severity"}), ()),
+    "overdue": (frozenset({"overdue", "late"}), ("past due",)),
+    "summary": (frozenset({"summary", "overview", "insights"}), ()),
+    "help": (frozenset({"help", "questions"}), ("what can",)),
+}
+
+# Blocked tickets are counted within the pending bucket, and on their own on request
+_BLOCKED = frozenset({"blocked"})
+# Question words that ask about in-progress tickets
+_PROGRESS_WORDS = frozenset({"progress", "inprogress"})
+# Intents whose answers bucket the lowercased status labels
+_STATUS_INTENTS = frozenset({"count", "summary"})
+
 
 def analyze_data_for_chat(df: pd.DataFrame, question: str) -> str:
     """Token-free chat that analyzes data directly"""
     q_lower = question.lower()
     
-    # Find relevant columns
-    status_col = None
-    assignee_col = None
-    priority_col = None
-    created_col = None
-    due_col = None
-    
-    for col in df.columns:
-        c_lower = col.lower()
-        if c_lower == "status":
-            status_col = col
-        elif c_lower == "assignee":
-            assignee_col = col
-        elif "priority" in c_lower or "severity" in c_lower:
-            priority_col = col
-        elif "created" in c_lower:
-            created_col = col
-        elif "due" in c_lower:
-            due_col = col
+    # Find relevant columns (memoized per column layout)
+    cols = canonical_columns(df)
+    status_col = cols.get("status")
+    assignee_col = cols.get("resource")
+    priority_col = cols.get("priority")
+    created_col = cols.get("created")
+    due_col = cols.get("due")
     
     total = len(df)
     
+    # Tokenize once; intents and sub-questions are then set lookups
+    tokens = set(re.findall(r"[a-z]+", q_lower))
+    intent = next(
+        (name for name, (words, phrases) in _INTENT_TRIGGERS.items() if tokens & words or any(p in q_lower for p in phrases)),
+        None,
+    )
+    # Lowercased once, and only for the intents that count statuses
+    status_lc = lowercase_labels(df[status_col]) if status_col and intent in _STATUS_INTENTS else None
+    
     # Answer patterns
-    if any(word in q_lower for word in ["how many", "count", "total", "number of"]):
-        if "in progress" in q_lower or "progress" in q_lower:
+    if intent == "count":
+        if tokens & _PROGRESS_WORDS:
             if status_col:
-                in_progress = df[status_col].astype(str).str.lower().isin(["in progress", "in-progress", "inprogress"]).sum()
+                in_progress = status_lc.isin(IN_PROGRESS_STATUSES).sum()
                 return f"There are **{in_progress}** tickets currently in progress."
-        elif "completed" in q_lower or "done" in q_lower:
+        elif "completed" in tokens or "done" in tokens:
             if status_col:
-                completed = df[status_col].astype(str).str.lower().isin(["done", "completed", "closed", "finished"]).sum()
+                completed = status_lc.isin(DONE_STATUSES).sum()
                 return f"There are **{completed}** completed tickets."
-        elif "pending" in q_lower:
+        elif "pending" in tokens:
             if status_col:
-                pending = df[status_col].astype(str).str.lower().isin(["pending", "backlog", "paused", "blocked"]).sum()
+                pending = status_lc.isin(PENDING_STATUSES).sum()
                 return f"There are **{pending}** pending tickets."
-        elif "active" in q_lower:
+        elif "active" in tokens:
             if status_col:
                 # Active Tickets: "To do", "In Progress", and "Reopened"
-                todo_statuses = ["to do", "todo", "to-do"]
-                in_progress_statuses = ["in progress", "in-progress", "inprogress"]
-                reopened_statuses = ["reopened", "re-open", "reopen", "re opened"]
-                active_statuses = todo_statuses + in_progress_statuses + reopened_statuses
-                active = df[status_col].astype(str).str.lower().isin(active_statuses).sum()
+                active = status_lc.isin(ACTIVE_STATUSES).sum()
                 return f"There are **{active}** active tickets (To do, In Progress, and Reopened)."
-        elif "blocked" in q_lower:
+        elif "blocked" in tokens:
             if status_col:
-                blocked = df[status_col].astype(str).str.lower().isin(["blocked"]).sum()
+                blocked = status_lc.isin(_BLOCKED).sum()
                 return f"There are **{blocked}** blocked tickets."
         else:
             return f"There are **{total}** tickets in total."
     
-    elif any(word in q_lower for word in ["who", "assignee", "assigned", "owner"]):
+    elif intent == "who":
         if assignee_col:
-            assignee_counts = df[assignee_col].value_counts().head(5)
+            assignee_counts = df[assignee_col].value_counts().loc[lambda c: c > 0].head(5)
             if len(assignee_counts) > 0:
-                result = "Top assignees:\n"
-                for name, count in assignee_counts.items():
-                    result += f"- **{name}**: {count} tickets\n"
-                return result
+                return "Top assignees:\n" + "".join(f"- **{name}**: {count} tickets\n" for name, count in assignee_counts.items())
             return "No assignee information available."
         return "Assignee column not found in the data."
     
-    elif any(word in q_lower for word in ["status", "statuses", "states"]):
+    elif intent == "status":
         if status_col:
-            status_counts = df[status_col].value_counts()
-            result = "Status distribution:\n"
-            for status, count in status_counts.items():
-                pct = (count / total * 100) if total > 0 else 0
-                result += f"- **{status}**: {count} ({pct:.1f}%)\n"
-            return result
+            # Categorical statuses keep unused labels after filtering; list only present ones
+            status_counts = df[status_col].value_counts().loc[lambda c: c > 0]
+            inv = 100.0 / total if total else 0.0
+            return "Status distribution:\n" + "".join(
+                f"- **{status}**: {count} ({count * inv:.1f}%)\n" for status, count in status_counts.items()
+            )
         return "Status column not found."
     
-    elif any(word in q_lower for word in ["priority", "priorities", "severity"]):
+    elif intent == "priority":
         if priority_col:
-            priority_counts = df[priority_col].value_counts()
-            result = "Priority breakdown:\n"
-            for priority, count in priority_counts.items():
-                result += f"- **{priority}**: {count} tickets\n"
-            return result
+            priority_counts = df[priority_col].value_counts().loc[lambda c: c > 0]
+            return "Priority breakdown:\n" + "".join(
+                f"- **{priority}**: {count} tickets\n" for priority, count in priority_counts.items()
+            )
         return "Priority column not found in the data."
     
-    elif any(word in q_lower for word in ["overdue", "late", "past due"]):
+    elif intent == "overdue":
         if due_col and created_col:
             now = datetime.now()
-            df_copy = df.copy()
-            df_copy["due_dt"] = pd.to_datetime(df_copy[due_col], errors="coerce")
-            overdue = df_copy[df_copy["due_dt"] < pd.Timestamp(now)].copy()
-            if len(overdue) > 0:
-                return f"There are **{len(overdue)}** overdue tickets (past their due date)."
+            overdue_count = int((as_datetime(df[due_col]) < pd.Timestamp(now)).sum())
+            if overdue_count > 0:
+                return f"There are **{overdue_count}** overdue tickets (past their due date)."
             return "No overdue tickets found."
         return "Due date column not found."
     
-    elif any(word in q_lower for word in ["summary", "overview", "insights"]):
+    elif intent == "summary":
         if status_col:
-            status_counts = df[status_col].value_counts()
+            # One count per lowercased label; the buckets then add up a few labels each
+            label_counts = status_lc.value_counts().to_dict()
             # Active Tickets: "To do", "In Progress", and "Reopened"
-            todo_statuses = ["to do", "todo", "to-do"]
-            in_progress_statuses = ["in progress", "in-progress", "inprogress"]
-            reopened_statuses = ["reopened", "re-open", "reopen", "re opened"]
-            active_statuses = todo_statuses + in_progress_statuses + reopened_statuses
-            active = df[status_col].astype(str).str.lower().isin(active_statuses).sum()
-            completed = df[status_col].astype(str).str.lower().isin(["done", "completed", "closed", "finished"]).sum()
-            pending = df[status_col].astype(str).str.lower().isin(["pending", "backlog", "paused", "blocked"]).sum()
+            active = sum(label_counts.get(label, 0) for label in ACTIVE_STATUSES)
+            completed = sum(label_counts.get(label, 0) for label in DONE_STATUSES)
+            pending = sum(label_counts.get(label, 0) for label in PENDING_STATUSES)
             
-            result = f"**Dashboard Summary:**\n\n"
-            result += f"Total tickets: **{total}**\n"
-            result += f"- Active: **{active}** ({active/total*100:.1f}%)\n" if total > 0 else ""
-            result += f"- Completed: **{completed}** ({completed/total*100:.1f}%)\n" if total > 0 else ""
-            result += f"- Pending: **{pending}** ({pending/total*100:.1f}%)\n" if total > 0 else ""
+            lines = ["**Dashboard Summary:**\n\n", f"Total tickets: **{total}**\n"]
+            if total > 0:
+                inv = 100.0 / total
+                lines += [
+                    f"- Active: **{active}** ({active * inv:.1f}%)\n",
+                    f"- Completed: **{completed}** ({completed * inv:.1f}%)\n",
+                    f"- Pending: **{pending}** ({pending * inv:.1f}%)\n",
+                ]
             
             if assignee_col:
-                top_assignee = df[assignee_col].value_counts().head(1)
+                top_assignee = df[assignee_col].value_counts().loc[lambda c: c > 0].head(1)
                 if len(top_assignee) > 0:
-                    result += f"\nTop assignee: **{top_assignee.index[0]}** with {top_assignee.iloc[0]} tickets"
+                    lines.append(f"\nTop assignee: **{top_assignee.index[0]}** with {top_assignee.iloc[0]} tickets")
             
-            return result
+            return "".join(lines)
         return "Unable to generate summary - status column not found."
     
-    elif any(word in q_lower for word in ["help", "what can", "questions"]):
+    elif intent == "help":
         return """**I can answer questions about:**
 - How many tickets (total, in progress, completed, pending, blocked)
 - Status distribution
@@ -148,8 +158,7 @@ def local_chat_ui(filtered_df: pd.DataFrame) -> None:
     """Token-free chat interface"""
     st.subheader("💬 Data Assistant")
     
-    if "local_chat_history" not in st.session_state:
-        st.session_state.local_chat_history = []  # type: ignore[attr-defined]
+    st.session_state.setdefault("local_chat_history", [])
     
     # Show chat history
     for msg in st.session_state.local_chat_history:  # type: ignore[attr-defined]
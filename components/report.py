@@ -1,18 +1,29 @@
 from __future__ import annotations
 
 import base64
+import html
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Tuple
+from typing import Iterator, Tuple
 
 import pandas as pd
+import streamlit as st
 
-# Plotly import - required for report generation
-try:
+from .charts import PNG_EXPORT_AVAILABLE, _png_export_works
+from .data_loader import canonical_columns
+from .utils import ACTIVE_STATUSES, DONE_STATUSES, PENDING_STATUSES, as_datetime, lowercase_labels, module_available
+
+# Plotly is required for report generation; it is imported when the first report is built
+PLOTLY_AVAILABLE = module_available("plotly")
+
+
+def _px():
+    """plotly.express, imported on first use."""
     import plotly.express as px
-    PLOTLY_AVAILABLE = True
-except ImportError:
-    PLOTLY_AVAILABLE = False
-    px = None  # type: ignore
+    return px
+
+# The report is a summary, not an export: larger tables are cut to this many rows
+_REPORT_MAX_ROWS = 50_000
 
 
 def _fig_to_base64_png(fig) -> str:
@@ -28,82 +39,78 @@ def _fig_to_base64_png(fig) -> str:
         return ""
 
 
-def _build_kpis(df: pd.DataFrame) -> Tuple[int, int, int, int]:
+def _build_kpis(df: pd.DataFrame, cols: dict[str, str]) -> Tuple[int, int, int, int]:
     total = len(df)
-    status_col = "Status" if "Status" in df.columns else ("status" if "status" in df.columns else None)
+    status_col = cols.get("status")
     active = completed = pending = 0
     if status_col:
-        vals = df[status_col].astype(str).str.lower()
-        # Active Tickets: "To do", "In Progress", and "Reopened"
-        todo_statuses = ["to do", "todo", "to-do"]
-        in_progress_statuses = ["in progress", "in-progress", "inprogress"]
-        reopened_statuses = ["reopened", "re-open", "reopen", "re opened"]
-        active_statuses = todo_statuses + in_progress_statuses + reopened_statuses
-        active = int(vals.isin(active_statuses).sum())
-        completed = int(vals.isin(["done", "completed", "closed", "finished"]).sum())
-        pending = int(vals.isin(["pending", "backlog", "paused", "blocked"]).sum())
+        vals = lowercase_labels(df[status_col])
+        active = int(vals.isin(ACTIVE_STATUSES).sum())
+        completed = int(vals.isin(DONE_STATUSES).sum())
+        pending = int(vals.isin(PENDING_STATUSES).sum())
     return total, active, completed, pending
 
 
-def _status_chart(df: pd.DataFrame):
+def _status_chart(df: pd.DataFrame, cols: dict[str, str]):
     if not PLOTLY_AVAILABLE:
         return None
-    col = "Status" if "Status" in df.columns else ("status" if "status" in df.columns else None)
+    col = cols.get("status")
     if not col:
         return None
-    counts = df[col].value_counts().reset_index()
+    counts = df[col].value_counts().loc[lambda c: c > 0].reset_index()
     counts.columns = ["status", "count"]
-    return px.pie(counts, values="count", names="status", hole=0.4, title="Tickets by Status")
+    return _px().pie(counts, values="count", names="status", hole=0.4, title="Tickets by Status")
 
 
 def _client_chart(df: pd.DataFrame):
     if not PLOTLY_AVAILABLE:
         return None
-    agg = {}
-    for c in df.columns:
-        if any(k in c.lower() for k in ["client", "customer", "account", "keyword", "tag"]):
-            for v in df[c].fillna("").astype(str):
-                for p in [s.strip() for s in v.replace(";", ",").split(",") if s.strip()]:
-                    agg[p] = agg.get(p, 0) + 1
-    if not agg:
+    tag_cols = [c for c in df.columns if any(k in c.lower() for k in ["client", "customer", "account", "keyword", "tag"])]
+    if not tag_cols:
+        return None
+    # Every non-empty cell of the matching columns, split on ";"/"," and counted in one pass
+    cells = pd.concat([df[c].dropna().astype(str) for c in tag_cols], ignore_index=True)
+    parts = cells.str.split(r"[;,]", regex=True).explode().str.strip()
+    counts = parts[parts.fillna("") != ""].value_counts()
+    if counts.empty:
         return None
-    dd = pd.DataFrame({"client": list(agg.keys()), "count": list(agg.values())}).sort_values("count", ascending=False)
-    return px.bar(dd, x="client", y="count", title="Tickets by Client")
+    dd = counts.rename_axis("client").reset_index(name="count")
+    return _px().bar(dd, x="client", y="count", title="Tickets by Client")
 
 
-def _timeline_chart(df: pd.DataFrame):
+def _timeline_chart(df: pd.DataFrame, cols: dict[str, str]):
     if not PLOTLY_AVAILABLE:
         return None
-    start = next((c for c in df.columns if "start" in c.lower() or c.lower() == "date"), None)
-    end = next((c for c in df.columns if "end" in c.lower()), None)
-    label = next((c for c in df.columns if c.lower() in ("project", "name", "title")), df.columns[0] if len(df.columns) else None)
+    start, end, label = cols.get("start"), cols.get("end"), cols.get("label")
     if not start or not label:
         return None
-    tdf = df.copy()
-    tdf["start"] = pd.to_datetime(tdf[start], errors="coerce")
-    tdf["end"] = pd.to_datetime(tdf[end], errors="coerce") if end else tdf["start"]
-    tdf = tdf.dropna(subset=["start"]) 
-    if tdf.empty:
+    start_dt = as_datetime(df[start])
+    keep = start_dt.notna().to_numpy()
+    if not keep.any():
         return None
-    fig = px.timeline(tdf, x_start="start", x_end="end", y=label, title="Ticket Timeline")
+    # Only the plotted columns of the rows with a start date are read (and parsed)
+    start_dt = start_dt[keep]
+    end_dt = as_datetime(df[end][keep]) if end else start_dt
+    tdf = pd.DataFrame({label: df[label][keep], "start": start_dt, "end": end_dt})
+    fig = _px().timeline(tdf, x_start="start", x_end="end", y=label, title="Ticket Timeline")
     fig.update_yaxes(autorange="reversed")
     return fig
 
 
-def _trend_chart(df: pd.DataFrame):
+def _trend_chart(df: pd.DataFrame, cols: dict[str, str]):
     if not PLOTLY_AVAILABLE:
         return None
-    date_col = next((c for c in df.columns if "date" in c.lower() or c.lower() in ("created", "start")), None)
+    date_col = cols.get("date")
     if not date_col:
         return None
-    tdf = df.copy()
-    tdf["dt"] = pd.to_datetime(tdf[date_col], errors="coerce")
-    tdf = tdf.dropna(subset=["dt"]) 
-    if tdf.empty:
+    dt = as_datetime(df[date_col]).dropna()
+    if dt.empty:
         return None
-    tdf["month"] = tdf["dt"].dt.to_period("M").astype(str)
-    counts = tdf.groupby("month").size().reset_index(name="count")
-    return px.line(counts, x="month", y="count", markers=True, title="Ticket Trend Over Time")
+    # Count per month first; only the month labels are formatted as text
+    counts = dt.dt.to_period("M").value_counts().sort_index()
+    counts.index = counts.index.astype(str)
+    counts = counts.rename_axis("month").reset_index(name="count")
+    return _px().line(counts, x="month", y="count", markers=True, title="Ticket Trend Over Time")
 
 
 def _fig_to_html_div(fig, div_id: str) -> str:
@@ -119,26 +126,56 @@ def _fig_to_html_div(fig, div_id: str) -> str:
         return ""
 
 
+def _iter_table_html(df: pd.DataFrame) -> Iterator[str]:
+    """Yield ``df`` as an HTML table, one row at a time.
+
+    Cells are formatted a column at a time; only text columns go through html.escape.
+    """
+    yield '<table border="1" class="dataframe">\n<thead><tr>'
+    yield "".join(f"<th>{html.escape(str(c))}</th>" for c in df.columns)
+    yield "</tr></thead>\n<tbody>\n"
+    cells = []
+    for c in df.columns:
+        s = df[c]
+        text = s.astype(str).where(s.notna(), "")
+        if not (pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s)):
+            text = text.map(html.escape)
+        cells.append(text.tolist())
+    for row in zip(*cells):
+        yield "<tr><td>" + "</td><td>".join(row) + "</td></tr>\n"
+    yield "</tbody>\n</table>"
+
+
 def generate_report_html(df: pd.DataFrame, title: str = "R&D Tickets Dashboard Report") -> bytes:
-    total, active, completed, pending = _build_kpis(df)
+    # Columns are resolved once; each builder then reads only the columns it plots
+    cols = canonical_columns(df)
+    total, active, completed, pending = _build_kpis(df, cols)
 
     figs = [
-        ("status", _status_chart(df)),
+        ("status", _status_chart(df, cols)),
         ("client", _client_chart(df)),
-        ("timeline", _timeline_chart(df)),
-        ("trend", _trend_chart(df)),
+        ("timeline", _timeline_chart(df, cols)),
+        ("trend", _trend_chart(df, cols)),
     ]
     images = []
     html_charts = []
     needs_plotly_js = False
-    
+
+    # Try PNG export first (requires Chrome/Kaleido). Each export waits on the
+    # Kaleido browser process, so the figures are rendered concurrently; when the
+    # one-off probe says Kaleido cannot render, go straight to the HTML fallback.
+    pngs = {}
+    if PLOTLY_AVAILABLE and PNG_EXPORT_AVAILABLE and _png_export_works():
+        present = [fig for _, fig in figs if fig is not None]
+        with ThreadPoolExecutor(max_workers=max(1, len(present))) as pool:
+            pngs = dict(zip(map(id, present), pool.map(_fig_to_base64_png, present)))
+
     for idx, (name, fig) in enumerate(figs):
         if fig is None:
             continue
         try:
             title_text = fig.layout.title.text if fig.layout.title and hasattr(fig.layout.title, 'text') else name
-            # Try PNG export first (requires Chrome/Kaleido)
-            b64 = _fig_to_base64_png(fig)
+            b64 = pngs.get(id(fig), "")
             if b64:
                 # PNG export succeeded
                 images.append((name, b64, title_text))
@@ -153,8 +190,6 @@ def generate_report_html(df: pd.DataFrame, title: str = "R&D Tickets Dashboard R
             # Skip charts that fail to generate
             continue
 
-    table_html = df.to_html(index=False, escape=False)
-
     # Build HTML report
     parts = [
         "<!DOCTYPE html>",
@@ -200,12 +235,22 @@ def generate_report_html(df: pd.DataFrame, title: str = "R&D Tickets Dashboard R
     if not images and not html_charts:
         parts.append("<p><em>Charts could not be generated. Please ensure data contains the required columns.</em></p>")
     
-    parts += [
-        "<h2>Filtered Data</h2>",
-        f"<div style='overflow-x: auto;'>{table_html}</div>",
-        "</body></html>",
-    ]
-    html = "\n".join(parts)
-    return html.encode("utf-8")
+    parts.append("<h2>Filtered Data</h2>")
+    if len(df) > _REPORT_MAX_ROWS:
+        parts.append(f"<p><em>Showing the first {_REPORT_MAX_ROWS:,} of {len(df):,} rows.</em></p>")
+    parts.append("<div style='overflow-x: auto;'>")
+
+    # Encode straight into one buffer; the table is streamed row by row
+    out = BytesIO()
+    out.write("\n".join(parts).encode("utf-8"))
+    for chunk in _iter_table_html(df.head(_REPORT_MAX_ROWS)):
+        out.write(chunk.encode("utf-8"))
+    out.write(b"</div>\n</body></html>")
+    return out.getvalue()
 
 
+# Reports run to several MB each; keep only the last few filter combinations
+@st.cache_data(show_spinner=False, max_entries=4, ttl=3600)
+def generate_report_html_cached(df: pd.DataFrame, title: str = "R&D Tickets Dashboard Report") -> bytes:
+    """Memoized generate_report_html: an unchanged filtered frame reuses the rendered report."""
+    return generate_report_html(df, title=title)
@@ -1,16 +1,45 @@
 from __future__ import annotations
 
+import importlib.util
 import io
+import itertools
 import json
-from datetime import datetime
-from typing import Iterable, List, Optional
+import re
+from datetime import datetime, timezone
+from typing import Collection, Iterable, Iterator, List, Optional
 
+import numpy as np
 import pandas as pd
+import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+# Characters str.isalnum() rejects; stripped from keyword candidates
+_NON_ALNUM = re.compile(r"[\W_]+")
 
-def inject_css() -> None:
-    css = """
+# Lowercased status label -> KPI bucket. Active tickets are todo + inprog + reopened.
+STATUS_BUCKET = {
+    "to do": "todo", "todo": "todo", "to-do": "todo",
+    "in progress": "inprog", "in-progress": "inprog", "inprogress": "inprog",
+    "reopened": "reopened", "re-open": "reopened", "reopen": "reopened", "re opened": "reopened",
+    "done": "done", "completed": "done", "closed": "done", "finished": "done",
+    "pending": "pending", "backlog": "pending", "paused": "pending", "blocked": "pending",
+}
+
+
+def _bucket_labels(*buckets: str) -> frozenset:
+    return frozenset(label for label, bucket in STATUS_BUCKET.items() if bucket in buckets)
+
+
+# The same buckets as label sets, for isin tests on lowercased statuses
+IN_PROGRESS_STATUSES = _bucket_labels("inprog")
+ACTIVE_STATUSES = _bucket_labels("todo", "inprog", "reopened")
+DONE_STATUSES = _bucket_labels("done")
+PENDING_STATUSES = _bucket_labels("pending")
+
+
+_CSS = """
     <style>
       /* Animations */
       @keyframes fadeIn {
@@ -209,24 +238,36 @@ def inject_css() -> None:
       }
     </style>
     """
-    st.markdown(css, unsafe_allow_html=True)
+
+# Sent with every rerun (elements a run does not emit are dropped from the page),
+# so comments and indentation are stripped once at import to shrink the payload
+_CSS_HTML = re.sub(r"\s+", " ", re.sub(r"/\*.*?\*/", "", _CSS, flags=re.S)).strip()
+
+
+def inject_css() -> None:
+    st.markdown(_CSS_HTML, unsafe_allow_html=True)
 
 
 def to_csv_bytes(df: pd.DataFrame) -> bytes:
-    buf = io.StringIO()
-    df.to_csv(buf, index=False)
-    return buf.getvalue().encode("utf-8")
+    # pandas encodes into the binary buffer as it writes; no intermediate str
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, encoding="utf-8")
+    return buf.getvalue()
 
 
-def openpyxl_available() -> bool:
-    """Check if openpyxl is available."""
+def module_available(name: str) -> bool:
+    """Whether ``name`` can be imported, without importing it (or paying its import time)."""
     try:
-        import openpyxl  # noqa: F401
-        return True
-    except ImportError:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
         return False
 
 
+def openpyxl_available() -> bool:
+    """Check if openpyxl is available."""
+    return module_available("openpyxl")
+
+
 def to_excel_bytes(df: pd.DataFrame) -> bytes:
     try:
         from openpyxl import Workbook
@@ -236,55 +277,150 @@ def to_excel_bytes(df: pd.DataFrame) -> bytes:
             "Install it with: pip install openpyxl"
         ) from e
 
-    wb = Workbook()
-    ws = wb.active
+    # Write-only mode streams rows to the sheet instead of keeping a cell grid in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
     ws.append(list(df.columns))
-    for _, row in df.iterrows():
-        ws.append([None if pd.isna(v) else v for v in row.tolist()])
+    # One object array with every missing value (NaN/NaT/NA) masked to None up front
+    values = df.to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    # Rows become Python lists one at a time, so only one row is ever boxed twice
+    for row in values:
+        ws.append(row.tolist())
     out = io.BytesIO()
     wb.save(out)
     return out.getvalue()
 
 
+def http_session(
+    retries: int = 2,
+    backoff_factor: float = 0.5,
+    status_forcelist: Collection[int] = (429, 502, 503, 504),
+    allowed_methods: Collection[str] = ("GET", "HEAD", "POST"),
+) -> requests.Session:
+    """Keep-alive session with a pooled HTTPS adapter and exponential backoff on transient errors."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(allowed_methods),
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+    return session
+
+
+_openrouter_key: Optional[str] = None
+
+
+def openrouter_api_key() -> str | None:
+    """OpenRouter key from secrets. Kept once found; a missing key is looked up again on the next call."""
+    global _openrouter_key
+    if not _openrouter_key:
+        try:
+            _openrouter_key = st.secrets["openrouter"]["api_key"] or None  # type: ignore[index]
+        except Exception:
+            return None
+    return _openrouter_key
+
+
+def iter_sse_content(resp: requests.Response) -> Iterator[str]:
+    """Yield content deltas from an OpenAI-style streaming (server-sent events) response."""
+    resp.encoding = "utf-8"
+    try:
+        for line in resp.iter_lines(decode_unicode=True):
+            # Skip blank separators and ": keep-alive" comment frames
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            if "error" in chunk:
+                raise RuntimeError(chunk["error"].get("message", "Stream error"))
+            choices = chunk.get("choices") or []
+            if choices:
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    yield content
+    finally:
+        resp.close()
+
+
+_TS_FMT = "%Y-%m-%d %H:%M:%S UTC"
+
+
 def now_ts() -> str:
-    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+    return datetime.now(timezone.utc).strftime(_TS_FMT)
 
 
 def dataframe_to_compact_json(df: pd.DataFrame, max_rows: int = 100) -> str:
+    if df.empty:
+        return "[]"
     sample = df.head(max_rows)
-    return json.dumps(json.loads(sample.to_json(orient="records")), ensure_ascii=False, separators=(",", ":"))
+    # to_json already emits separator-free JSON and force_ascii=False keeps text as-is;
+    # only its escaped "/" (e.g. in URLs) is undone, with one string replace
+    return sample.to_json(orient="records", date_format="iso", force_ascii=False).replace("\\/", "/")
+
+
+def as_datetime(s: pd.Series) -> pd.Series:
+    """Return ``s`` as datetime64; columns already typed at load time pass through unparsed."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    return pd.to_datetime(s, errors="coerce")
+
+
+def lowercase_labels(s: pd.Series) -> pd.Series:
+    """``s`` as a categorical of lowercased labels.
+
+    Only the distinct labels are lowercased (labels that collapse, e.g. "Done"/"done",
+    share one code), so ``isin`` and ``map`` on the result work on integer codes.
+    Columns that are not categorical yet are factorized first.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, labels = s.cat.codes.to_numpy(), s.cat.categories
+    else:
+        codes, labels = pd.factorize(s)
+    lower_codes, lower = pd.factorize(labels.astype(str).str.lower())
+    # Code -1 (missing) picks the appended -1 and stays missing; this also covers
+    # all-missing columns, which have no labels at all
+    codes = np.append(lower_codes, -1)[codes]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=lower), index=s.index, name=s.name)
+
+
+# Well-known date column names, offered first and in this order
+_DATE_CANDIDATES = (
+    "date", "Date", "created", "Created", "start", "Start", "start_date",
+    "Start Date", "end", "End", "end_date", "End Date",
+)
 
 
 def find_date_columns(df: pd.DataFrame) -> List[str]:
-    candidates = [
-        "date", "Date", "created", "Created", "start", "Start", "start_date",
-        "Start Date", "end", "End", "end_date", "End Date",
-    ]
-    present = [c for c in candidates if c in df.columns]
-    extras = [c for c in df.columns if "date" in c.lower() and c not in present]
+    columns = set(df.columns)
+    present = [c for c in _DATE_CANDIDATES if c in columns]
+    seen = set(present)
+    extras = [c for c in df.columns if c not in seen and "date" in c.lower()]
     return present + extras
 
 
 def extract_clients(df: pd.DataFrame) -> List[str]:
     # Priority: Summary column for keywords, then other columns
-    values: List[str] = []
+    values: set = set()
     
-    # First try Summary column for keywords
+    # First try Summary column for keywords: split every cell in one pass over a
+    # joined buffer, then classify each distinct word once
     summary_cols = [c for c in df.columns if "summary" in c.lower() or "description" in c.lower()]
-    for col in summary_cols:
-        series = df[col].dropna().astype(str)
-        for v in series:
-            # Extract potential client names (uppercase words, acronyms, etc.)
-            words = v.split()
-            for word in words:
-                # Look for uppercase words that might be client names
-                if word.isupper() and len(word) >= 2:
-                    values.append(word.strip())
-                # Look for patterns like "VP30", "VAIA", etc.
-                if any(c.isupper() for c in word) and len(word) >= 2:
-                    cleaned = ''.join(c for c in word if c.isalnum())
-                    if cleaned and len(cleaned) >= 2:
-                        values.append(cleaned)
+    blob = "\n".join(itertools.chain.from_iterable(df[c].dropna().astype(str).tolist() for c in summary_cols))
+    words = pd.Series(list(set(blob.split())), dtype=object)
+    # Potential client names: words with an uppercase letter (e.g. "VP30", "VAIA")
+    words = words[(words.str.len() >= 2) & (words.str.lower() != words)]
+    # Fully uppercase words are kept as written; all candidates are also kept without punctuation
+    values.update(words[words.str.isupper()])
+    values.update(words.str.replace(_NON_ALNUM, "", regex=True))
     
     # Fallback to other columns
     possible_cols = [
@@ -293,12 +429,8 @@ def extract_clients(df: pd.DataFrame) -> List[str]:
     ]
     for col in possible_cols:
         if col in df.columns:
-            series = df[col].dropna().astype(str)
-            for v in series:
-                if ";" in v or "," in v:
-                    values.extend([p.strip() for p in v.replace(";", ",").split(",") if p.strip()])
-                else:
-                    values.append(v.strip())
+            parts = df[col].dropna().astype(str).str.split(r"[;,]", regex=True).explode().str.strip()
+            values.update(parts.dropna().unique())
     
     uniq = sorted({v for v in values if v and len(v) >= 2})
     return uniq
@@ -0,0 +1,31 @@
+import unittest
+
+import numpy as np
+
+from components.charts import _lttb_indices
+
+
+class LttbIndicesTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.arange(1000, dtype=float)
+        self.y = rng.normal(size=1000).cumsum()
+
+    def test_keeps_endpoints(self):
+        idx = _lttb_indices(self.x, self.y, 50)
+        self.assertEqual(idx[0], 0)
+        self.assertEqual(idx[-1], 999)
+
+    def test_returns_n_out_sorted_unique_indices(self):
+        idx = _lttb_indices(self.x, self.y, 50)
+        self.assertEqual(len(idx), 50)
+        self.assertTrue((np.diff(idx) > 0).all())
+
+    def test_short_input_passes_through(self):
+        for n_out in (10, 20):
+            idx = _lttb_indices(self.x[:10], self.y[:10], n_out)
+            np.testing.assert_array_equal(idx, np.arange(10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from components import data_loader as dl
+from components.data_loader import _ARROW_STRING, _coerce_dates, _optimize_dtypes
+
+
+class CoerceDatesTest(unittest.TestCase):
+    def test_unparsable_cell_keeps_day_first_dates(self):
+        s = pd.Series(["25/03/2025", "05/03/2025", "TBD", None], dtype=object)
+        dt = _coerce_dates(s, non_null=3)
+        self.assertEqual(dt[1], pd.Timestamp("2025-03-05"))
+        self.assertTrue(pd.isna(dt[2]))
+
+
+class OptimizeDtypesTest(unittest.TestCase):
+    def test_numbers_that_do_not_round_trip_stay_text(self):
+        df = pd.DataFrame({
+            "ID": ["007", "010", "1.10"],
+            "Version": ["1.10", "1.2", None],
+            "Points": ["12", " 3", None],
+        })
+        out = _optimize_dtypes(df)
+        self.assertEqual(out["ID"].dtype, _ARROW_STRING)
+        self.assertEqual(out["ID"].tolist(), ["007", "010", "1.10"])
+        self.assertEqual(out["Version"].dtype, _ARROW_STRING)
+        self.assertEqual(out["Points"].tolist()[:2], [12, 3])
+
+    def test_date_hints_match_whole_words(self):
+        df = pd.DataFrame({
+            "Start_Date": ["2025-03-05", "2025-04-01"],
+            "Backend": ["2025-03-05", "2025-04-01"],
+        })
+        out = _optimize_dtypes(df)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(out["Start_Date"]))
+        self.assertEqual(out["Backend"].dtype, _ARROW_STRING)
+
+
+class FetchCsvTest(unittest.TestCase):
+    URL = "https://docs.google.com/spreadsheets/d/key/export?format=csv&gid=0"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache_dir = Path(tmp.name)
+        for name, value in (("CACHE_DIR", cache_dir), ("_CACHE_INDEX", cache_dir / "index.json")):
+            patcher = mock.patch.object(dl, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        dl._etag_cache.clear()
+        self.addCleanup(dl._etag_cache.clear)
+
+    def test_not_modified_returns_cached_parquet(self):
+        cached = pd.DataFrame({"Summary": ["Cached row"], "Status": ["Done"]})
+        cached.to_parquet(dl.CACHE_DIR / "csv-abc.parquet", engine="pyarrow", index=False)
+        dl._CACHE_INDEX.write_text(json.dumps({self.URL: {"etag": '"v1"', "last_modified": None, "hash": "csv-abc"}}))
+
+        with mock.patch.object(dl, "_SESSION") as session:
+            session.get.return_value = mock.Mock(status_code=304)
+            df = dl._fetch_csv(self.URL)
+
+        session.get.assert_called_once()
+        self.assertEqual(session.get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+        self.assertEqual(df["Summary"].tolist(), ["Cached row"])
+
+
+if __name__ == "__main__":
+    unittest.main()
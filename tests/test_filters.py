@@ -0,0 +1,18 @@
+import unittest
+
+import pandas as pd
+
+from components.filters import apply_dataframe_filters
+
+
+class ApplyDataframeFiltersTest(unittest.TestCase):
+    def test_keywords_match_case_insensitively(self):
+        df = pd.DataFrame({
+            "Summary": ["Acme portal login", "globex export", "Initech report", None],
+        })
+        out = apply_dataframe_filters(df, [], ["acme", "GLOBEX"], "", (None, None))
+        self.assertEqual(out["Summary"].tolist(), ["Acme portal login", "globex export"])
+
+
+if __name__ == "__main__":
+    unittest.main()
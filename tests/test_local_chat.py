@@ -0,0 +1,24 @@
+import unittest
+
+import pandas as pd
+
+from components.local_chat import analyze_data_for_chat
+
+
+class AnalyzeDataForChatTest(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({"Status": ["In Progress", "Done", "To Do", "in-progress", "Blocked"]})
+
+    def test_inprogress_as_one_word(self):
+        answer = analyze_data_for_chat(self.df, "how many inprogress tickets?")
+        self.assertIn("**2** tickets currently in progress", answer)
+
+    def test_summary_buckets(self):
+        answer = analyze_data_for_chat(self.df, "summary")
+        self.assertIn("Active: **3**", answer)
+        self.assertIn("Completed: **1**", answer)
+        self.assertIn("Pending: **1**", answer)
+
+
+if __name__ == "__main__":
+    unittest.main()
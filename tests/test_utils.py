@@ -0,0 +1,34 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from components.utils import lowercase_labels
+
+
+class LowercaseLabelsTest(unittest.TestCase):
+    def test_all_nan_categorical_status(self):
+        status = pd.Series([np.nan, np.nan], dtype="category")
+        result = lowercase_labels(status)
+        self.assertTrue(result.isna().all())
+        self.assertFalse(result.isin({"done"}).any())
+
+    def test_all_nan_uncategorized_status(self):
+        for status in (pd.Series([None, None], dtype=object), pd.Series([np.nan, np.nan])):
+            result = lowercase_labels(status)
+            self.assertTrue(result.isna().all())
+            self.assertFalse(result.isin({"done"}).any())
+
+    def test_empty_status(self):
+        for status in (pd.Series([], dtype=object), pd.Series([], dtype="category")):
+            self.assertEqual(len(lowercase_labels(status)), 0)
+
+    def test_case_variants_share_a_label(self):
+        for status in (pd.Series(["Done", None, "done", "To Do"]), pd.Series(["Done", None, "done", "To Do"], dtype="category")):
+            result = lowercase_labels(status)
+            self.assertEqual(result.isin({"done"}).tolist(), [True, False, True, False])
+            self.assertEqual(list(result.cat.categories), ["done", "to do"])
+
+
+if __name__ == "__main__":
+    unittest.main()